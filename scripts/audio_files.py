@@ -0,0 +1,23 @@
+"""各STTスクリプト共通の音声ファイル走査ヘルパー。"""
+
+import os
+from pathlib import Path
+
+
+def scan_audio_files(data_dir, patterns):
+    """ディレクトリを1回だけ走査し、対象拡張子のファイル一覧とサイズ(bytes)を返す
+
+    os.scandir の DirEntry は走査時の stat 情報を保持するため、
+    拡張子ごとの glob やファイルごとの getsize より syscall が少ない。
+    """
+    suffixes = tuple(p.lstrip("*") for p in patterns)
+    files = []
+    sizes = {}
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            if entry.name.endswith(suffixes) and entry.is_file(follow_symlinks=False):
+                path = Path(entry.path)
+                files.append(path)
+                sizes[path] = entry.stat(follow_symlinks=False).st_size
+    files.sort()
+    return files, sizes
@@ -2,17 +2,19 @@
 
 from __future__ import annotations
 
+import argparse
+from contextlib import nullcontext
 from typing import Iterable
 
-from models import AudioTranscription, get_db
+from models import AudioTranscription, deferred_chunk_indexes, get_db
 from services.rag_service import get_rag_service
 
 
 BATCH_SIZE = 50
 
 
-def _batched(iterable: Iterable[AudioTranscription], size: int):
-    batch: list[AudioTranscription] = []
+def _batched(iterable: Iterable, size: int):
+    batch: list = []
     for item in iterable:
         batch.append(item)
         if len(batch) >= size:
@@ -23,26 +25,56 @@ def _batched(iterable: Iterable[AudioTranscription], size: int):
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help=(
+            "ベクトル索引とFTSトリガを外して投入し、最後にまとめて再構築する（全件再索引向け）。"
+            "実行中は共有DB上の索引がなくなるため、アプリを停止してから使うこと"
+        ),
+    )
+    parser.add_argument(
+        "--i-know-the-app-is-offline",
+        dest="app_offline",
+        action="store_true",
+        help="--bulk の実行前に、DBを参照するアプリがすべて停止していることを確認済みと明示する",
+    )
+    args = parser.parse_args()
+    if args.bulk and not args.app_offline:
+        parser.error(
+            "--bulk は実行中のアプリのベクトル検索を失敗させます。"
+            "アプリを停止したうえで --i-know-the-app-is-offline を併せて指定してください。"
+        )
+
     rag = get_rag_service()
     if not rag.enabled:
         raise SystemExit("RAGが有効化されていません。DATABASE_URLやOPENAI_API_KEYを確認してください。")
 
     db = next(get_db())
     try:
-        records = db.query(AudioTranscription).order_by(AudioTranscription.id).all()
+        # 全カラム（structured_json等）を読み込まず、索引に必要な列だけ取得
+        records = (
+            db.query(AudioTranscription.id, AudioTranscription.transcript)
+            .order_by(AudioTranscription.id)
+            .all()
+        )
         if not records:
             print("バックフィル対象のレコードはありません。")
             return
 
         total = len(records)
         processed = 0
-        for chunk in _batched(records, BATCH_SIZE):
-            for row in chunk:
-                text = row.transcript or ""
-                rag.index_transcription(db, row.id, text)
-                processed += 1
-            db.commit()
-            print(f"{processed}/{total} 件を処理しました")
+        failed: list[int] = []
+        with deferred_chunk_indexes(db) if args.bulk else nullcontext():
+            for chunk in _batched(records, BATCH_SIZE):
+                # バッチ内の全チャンクを一括で埋め込み・INSERT
+                failed.extend(rag.index_transcriptions(db, [(row.id, row.transcript or "") for row in chunk]))
+                processed += len(chunk)
+                db.commit()
+                print(f"{processed}/{total} 件を処理しました")
+        if failed:
+            print(f"埋め込み生成に失敗し未索引の文字起こし: {len(failed)} 件 (id={failed})")
         print("バックフィルが完了しました。")
     finally:
         db.close()
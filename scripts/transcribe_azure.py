@@ -4,6 +4,8 @@ from datetime import datetime
 from pathlib import Path
 import azure.cognitiveservices.speech as speechsdk
 
+from audio_files import scan_audio_files
+
 # Azure設定
 AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
 AZURE_SERVICE_REGION = os.getenv("AZURE_SERVICE_REGION", "westus")
@@ -132,10 +134,6 @@ def save_transcription(filename, transcription, output_dir):
     
     return output_path
 
-def get_file_size_mb(file_path):
-    """ファイルサイズをMBで取得"""
-    return os.path.getsize(file_path) / (1024 * 1024)
-
 def process_all_audio_files():
     """dataディレクトリ内のすべての音声ファイルを処理"""
     # パスの設定
@@ -151,9 +149,7 @@ def process_all_audio_files():
     
     # サポートされている音声フォーマット
     audio_extensions = ["*.mp3", "*.mp4", "*.wav", "*.m4a", "*.flac"]
-    audio_files = []
-    for ext in audio_extensions:
-        audio_files.extend(data_dir.glob(ext))
+    audio_files, file_sizes = scan_audio_files(data_dir, audio_extensions)
     
     if not audio_files:
         print("音声ファイルが見つかりません。")
@@ -165,7 +161,7 @@ def process_all_audio_files():
         print(f"[{i}/{len(audio_files)}] 処理中: {audio_file.name}")
         
         # ファイルサイズをチェック（小さいファイルは単発認識を使用）
-        file_size_mb = get_file_size_mb(audio_file)
+        file_size_mb = file_sizes[audio_file] / (1024 * 1024)
         
         # 文字起こし実行
         if file_size_mb < 5:  # 5MB未満は単発認識
@@ -7,6 +7,8 @@ import re
 import logging
 from dotenv import load_dotenv
 
+from audio_files import scan_audio_files
+
 # .envファイルを読み込む
 load_dotenv()
 
@@ -43,21 +45,28 @@ if not ELEVENLABS_API_KEY:
     logger.warning("ELEVENLABS_API_KEY環境変数が設定されていません。")
     ELEVENLABS_API_KEY = "your-api-key"
 
+# _clean_transcript 用の正規表現（呼び出しごとに再コンパイルしないよう事前コンパイル）
+_EVENT_TAG_PATTERNS = [
+    re.compile(
+        r"[\[\(<]{1}\s*(laughter|applause|music|noise|inaudible|cough|sigh|breath|laughs|claps?)\s*[\)\]>]{1}",
+        re.IGNORECASE,
+    ),
+    re.compile(r"<\/?(applause|music|noise)>", re.IGNORECASE),
+]
+_MULTI_SPACE_RE = re.compile(r"\s{2,}")
+
+
 def _clean_transcript(text: str) -> str:
     """簡易クレンジング: 典型的なイベントタグやノイズ表現を除去。
     極力保守的に ASCII のイベント語のみ対象にする。
     """
     if not text:
         return text
-    patterns = [
-        r"[\[\(<]{1}\s*(laughter|applause|music|noise|inaudible|cough|sigh|breath|laughs|claps?)\s*[\)\]>]{1}",
-        r"<\/?(applause|music|noise)>",
-    ]
     out = text
-    for pat in patterns:
-        out = re.sub(pat, "", out, flags=re.IGNORECASE)
+    for pat in _EVENT_TAG_PATTERNS:
+        out = pat.sub("", out)
     # 連続スペースの正規化
-    out = re.sub(r"\s{2,}", " ", out).strip()
+    out = _MULTI_SPACE_RE.sub(" ", out).strip()
     return out
 
 
@@ -159,10 +168,6 @@ def save_transcription(filename, transcription, output_dir):
     
     return output_path
 
-def get_file_size_mb(file_path):
-    """ファイルサイズをMBで取得"""
-    return os.path.getsize(file_path) / (1024 * 1024)
-
 def process_all_audio_files():
     """dataディレクトリ内のすべての音声ファイルを処理"""
     # パスの設定
@@ -178,9 +183,7 @@ def process_all_audio_files():
     
     # サポートされている音声フォーマット（主要な音声/動画フォーマット）
     audio_extensions = ["*.mp3", "*.mp4", "*.wav", "*.m4a", "*.flac", "*.webm", "*.ogg", "*.aac", "*.mov", "*.avi"]
-    audio_files = []
-    for ext in audio_extensions:
-        audio_files.extend(data_dir.glob(ext))
+    audio_files, file_sizes = scan_audio_files(data_dir, audio_extensions)
     
     if not audio_files:
         logger.warning("音声ファイルが見つかりません。")
@@ -192,7 +195,7 @@ def process_all_audio_files():
         logger.info(f"[{i}/{len(audio_files)}] 処理中: {audio_file.name}")
         
         # ファイルサイズチェック（1GB制限）
-        file_size_mb = get_file_size_mb(audio_file)
+        file_size_mb = file_sizes[audio_file] / (1024 * 1024)
         if file_size_mb > 1024:  # 1GB = 1024MB
             logger.warning(f"  → スキップ: ファイルサイズが1GBを超えています ({file_size_mb:.2f}MB)")
             continue
@@ -1,9 +1,12 @@
 import streamlit as st
 from pathlib import Path
 import os
-from dotenv import load_dotenv
+import atexit
 import logging
+import logging.handlers
+import queue
 
+from bootstrap import load_env
 from ui.sidebar import build_sidebar
 from ui.tabs.upload_tab import run_upload_tab
 from ui.tabs.mic_tab import run_mic_tab
@@ -12,8 +15,8 @@ from ui.tabs.db_tab import run_db_tab
 from ui.tabs.rag_tab import run_rag_tab
 from ui.tabs.ceo_tab import run_ceo_tab
 from ui.tabs.ceo_db_tab import run_ceo_db_tab
-# .envファイルを読み込む
-load_dotenv()
+# .envファイルを読み込む（2回目以降の再実行では何もしない）
+load_env()
 
 from models import AudioTranscription, get_db
 from stt_wrapper import STTModelWrapper
@@ -30,15 +33,40 @@ logger.setLevel(logging.DEBUG)
 log_dir = Path(__file__).parent.parent / "logs"
 log_dir.mkdir(exist_ok=True)
 
-# ファイルハンドラー
-file_handler = logging.FileHandler(log_dir / "streamlit_app.log", encoding='utf-8')
-file_handler.setLevel(logging.DEBUG)
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
 
-# フォーマッター
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
 
-logger.addHandler(file_handler)
+@st.cache_resource
+def _build_log_queue_handler(log_path: str) -> logging.Handler:
+    """ローテーション付きファイル出力をQueueListener経由で1プロセス1回だけ構成する。
+
+    Streamlitは再実行のたびにこのスクリプトを評価するため、cache_resourceで
+    ハンドラーとリスナースレッドの多重生成を防ぐ。
+    """
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_path,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8',
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    # ログ呼び出し側はキューに積むだけにし、ディスク書き込みは別スレッドで行う
+    log_queue: queue.Queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(logging.DEBUG)
+    return queue_handler
+
+
+_log_queue_handler = _build_log_queue_handler(str(log_dir / "streamlit_app.log"))
+if _log_queue_handler not in logger.handlers:
+    logger.addHandler(_log_queue_handler)
 
 # ページ設定
 st.set_page_config(
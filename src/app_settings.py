@@ -1,36 +1,146 @@
+import atexit
+import copy
 import json
+import os
+import threading
+import weakref
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 import logging
 
+try:
+    import orjson  # 任意: インストールされていれば高速なJSONエンコード/デコードを使う
+except ImportError:  # pragma: no cover - orjson 未導入環境
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 設定変更をまとめて書き出すまでの待ち時間（秒）
+FLUSH_DELAY_SECONDS = 0.5
+
+# 未保存の変更を持つインスタンス（終了時・同一ファイルの再読込前にflushする）
+_pending_instances: "weakref.WeakSet[AppSettings]" = weakref.WeakSet()
+
+# 読み込み済み設定のキャッシュ: path -> (mtime_ns, size, 生バイト列, 解析済みdict)
+_SETTINGS_CACHE: Dict[Path, Tuple[int, int, bytes, Dict[str, Any]]] = {}
+_SETTINGS_CACHE_LOCK = threading.Lock()
+
+
+def _dumps_settings(settings: Dict[str, Any]) -> bytes:
+    """設定をインデント付きUTF-8 JSONのバイト列にする"""
+    if orjson is not None:
+        return orjson.dumps(settings, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(settings, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _loads_settings(raw: bytes) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+def _cache_settings(path: Path, raw: bytes, settings: Dict[str, Any]) -> None:
+    """ファイルの現在のstatをキーに設定内容をキャッシュする"""
+    try:
+        st = path.stat()
+    except OSError:
+        return
+    with _SETTINGS_CACHE_LOCK:
+        _SETTINGS_CACHE[path] = (st.st_mtime_ns, st.st_size, raw, copy.deepcopy(settings))
+
+
+def _flush_pending(settings_path: Optional[Path] = None) -> None:
+    """未保存の設定をファイルへ書き出す。settings_path指定時はそのファイル分のみ。"""
+    for instance in list(_pending_instances):
+        if settings_path is None or instance.settings_path == settings_path:
+            instance.flush()
+
+
+atexit.register(_flush_pending)
+
 class AppSettings:
     """アプリケーション設定を管理するクラス"""
     
-    def __init__(self, settings_file: str = ".app_settings.json"):
+    def __init__(self, settings_file: str = ".app_settings.json", fsync: bool = False):
         self.settings_path = Path(__file__).parent.parent / settings_file
+        # 小さな設定ファイルのため既定ではfsyncしない（原子的な置き換えのみ）
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_serialized: Optional[bytes] = None
+        # 別インスタンスの未保存変更を先に書き出してから読み込む
+        _flush_pending(self.settings_path)
         self.settings = self._load_settings()
     
     def _load_settings(self) -> Dict[str, Any]:
-        """設定ファイルを読み込む"""
-        if self.settings_path.exists():
-            try:
-                with open(self.settings_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"設定ファイルの読み込みエラー: {e}")
-                return {}
-        return {}
+        """設定ファイルを読み込む（mtime・サイズが変わっていなければキャッシュを返す）"""
+        try:
+            st = self.settings_path.stat()
+        except FileNotFoundError:
+            return {}
+        except OSError as e:
+            logger.error(f"設定ファイルの読み込みエラー: {e}")
+            return {}
+
+        with _SETTINGS_CACHE_LOCK:
+            cached = _SETTINGS_CACHE.get(self.settings_path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            self._last_serialized = cached[2]
+            return copy.deepcopy(cached[3])
+
+        try:
+            raw = self.settings_path.read_bytes()
+            settings = _loads_settings(raw)
+        except Exception as e:
+            logger.error(f"設定ファイルの読み込みエラー: {e}")
+            return {}
+        self._last_serialized = raw
+        _cache_settings(self.settings_path, raw, settings)
+        return settings
     
     def _save_settings(self):
-        """設定をファイルに保存"""
+        """設定をファイルに保存（内容が前回書き込みと同一ならスキップ）"""
         try:
-            with open(self.settings_path, "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, ensure_ascii=False, indent=2)
+            data = _dumps_settings(self.settings)
+            if data == self._last_serialized:
+                return
+            # 一時ファイルに書いてから置き換え、書き込み途中のクラッシュで壊れないようにする
+            tmp_path = self.settings_path.with_suffix(".json.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.settings_path)
+            self._last_serialized = data
+            _cache_settings(self.settings_path, data, self.settings)
             logger.debug(f"設定を保存しました: {self.settings_path}")
         except Exception as e:
             logger.error(f"設定ファイルの保存エラー: {e}")
+
+    def _mark_dirty(self):
+        """変更をマークし、FLUSH_DELAY_SECONDS 後にまとめて保存する"""
+        with self._lock:
+            self._dirty = True
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._flush_timer = threading.Timer(FLUSH_DELAY_SECONDS, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+        _pending_instances.add(self)
+
+    def flush(self):
+        """未保存の変更があればファイルへ書き出す"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._save_settings()
+            self._dirty = False
+        _pending_instances.discard(self)
     
     def get(self, key: str, default: Any = None) -> Any:
         """設定値を取得"""
@@ -38,8 +148,17 @@ class AppSettings:
     
     def set(self, key: str, value: Any):
         """設定値を保存"""
-        self.settings[key] = value
-        self._save_settings()
+        self.set_many({key: value})
+
+    def set_many(self, values: Dict[str, Any]):
+        """複数の設定値をまとめて保存（書き込みは1回）"""
+        changed = False
+        for key, value in values.items():
+            if key not in self.settings or self.settings[key] != value:
+                self.settings[key] = value
+                changed = True
+        if changed:
+            self._mark_dirty()
     
     def get_selected_stt_model(self) -> Optional[str]:
         """選択されたSTTモデルを取得"""
@@ -79,12 +198,9 @@ class AppSettings:
         if "use_vad" in self.settings:
             return bool(self.settings["use_vad"])
         if "vad_enabled" in self.settings:
-            # マイグレーション: 新キーへコピー
-            try:
-                self.settings["use_vad"] = bool(self.settings["vad_enabled"])
-                self._save_settings()
-            except Exception:
-                pass
+            # マイグレーション: 新キーへコピー（読み取り経路では書き込まず、遅延保存に回す）
+            self.settings["use_vad"] = bool(self.settings["vad_enabled"])
+            self._mark_dirty()
             return bool(self.settings["vad_enabled"])
         return True
 
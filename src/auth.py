@@ -1,54 +1,82 @@
 import streamlit as st
 import os
+import hashlib
 import hmac
 import secrets
 import json
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-import extra_streamlit_components as stx
+from functools import lru_cache
 
 
 # Cookie管理用のキー
 _AUTH_COOKIE_NAME = "stt_auth_token"
 _AUTH_TOKENS_KEY = "auth_tokens"  # 有効なトークンを保存するセッションキー
+_AUTH_TOKENS_MAX = 1024  # 保持するトークン数の上限（古いものから破棄）
+_AUTH_TOKEN_TTL_SECONDS = 86400  # トークンの有効期間（1日）
 
 # CookieManagerのシングルトンインスタンス
 def get_cookie_manager():
     """クッキーマネージャーのシングルトンインスタンスを取得"""
+    # Basic認証が無効なら不要なため、初回利用時に読み込む
+    import extra_streamlit_components as stx
+
     return stx.CookieManager(key="auth_cookie_manager")
 
+@lru_cache(maxsize=1)
+def get_basic_auth_credentials():
+    """BASIC_AUTH_USERNAME / BASIC_AUTH_PASSWORD を返す（.env再読み込み時に cache_clear する）"""
+    return os.getenv("BASIC_AUTH_USERNAME"), os.getenv("BASIC_AUTH_PASSWORD")
+
 def _generate_token():
     """セキュアなランダムトークンを生成"""
     return secrets.token_urlsafe(32)
 
+def _token_key(token):
+    """トークンをそのまま保持しないよう、ハッシュ値を保存キーにする"""
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+def _purge_expired_tokens(tokens):
+    """期限切れトークンを削除"""
+    now = time.time()
+    for key in [k for k, v in tokens.items() if v["expires"] <= now]:
+        del tokens[key]
+
 def _initialize_auth_storage():
     """認証ストレージの初期化"""
     if _AUTH_TOKENS_KEY not in st.session_state:
-        st.session_state[_AUTH_TOKENS_KEY] = {}
+        st.session_state[_AUTH_TOKENS_KEY] = OrderedDict()
     if "cookie_ready" not in st.session_state:
         st.session_state.cookie_ready = False
 
 def _save_auth_token(username, token):
     """認証トークンをセッションに保存"""
     _initialize_auth_storage()
-    # トークンと有効期限をセッションに保存
-    st.session_state[_AUTH_TOKENS_KEY][token] = {
+    tokens = st.session_state[_AUTH_TOKENS_KEY]
+    _purge_expired_tokens(tokens)
+    # トークン（のハッシュ）と有効期限をセッションに保存
+    tokens[_token_key(token)] = {
         "username": username,
-        "expires": (datetime.now() + timedelta(days=1)).isoformat()
+        "expires": int(time.time()) + _AUTH_TOKEN_TTL_SECONDS,  # UNIX秒
     }
+    # 上限を超えた分は古いものから破棄
+    while len(tokens) > _AUTH_TOKENS_MAX:
+        tokens.popitem(last=False)
     st.session_state.auth_token_to_save = token
 
 def _check_auth_token(token):
     """トークンの有効性をチェック"""
     _initialize_auth_storage()
     
-    if token in st.session_state[_AUTH_TOKENS_KEY]:
-        token_data = st.session_state[_AUTH_TOKENS_KEY][token]
-        expires = datetime.fromisoformat(token_data["expires"])
-        if datetime.now() < expires:
+    key = _token_key(token)
+    token_data = st.session_state[_AUTH_TOKENS_KEY].get(key)
+    if token_data is not None:
+        if time.time() < token_data["expires"]:
             return True
         else:
             # 期限切れトークンを削除
-            del st.session_state[_AUTH_TOKENS_KEY][token]
+            del st.session_state[_AUTH_TOKENS_KEY][key]
     return False
 
 def _handle_cookie_operations():
@@ -61,7 +89,7 @@ def _handle_cookie_operations():
             cookie_manager.set(
                 _AUTH_COOKIE_NAME,
                 st.session_state.auth_token_to_save,
-                expires_at=datetime.now() + timedelta(days=1)
+                expires_at=datetime.now() + timedelta(seconds=_AUTH_TOKEN_TTL_SECONDS)
             )
             del st.session_state.auth_token_to_save
         st.session_state.save_auth_cookie = False
@@ -78,9 +106,8 @@ def check_password():
     Basic認証のチェック（Cookie認証対応）
     環境変数BASIC_AUTH_USERNAMEとBASIC_AUTH_PASSWORDが設定されている場合のみ認証を要求
     """
-    # 環境変数から認証情報を取得
-    expected_username = os.getenv("BASIC_AUTH_USERNAME")
-    expected_password = os.getenv("BASIC_AUTH_PASSWORD")
+    # 環境変数から認証情報を取得（キャッシュ済み）
+    expected_username, expected_password = get_basic_auth_credentials()
     
     # 認証情報が設定されていない場合は認証をスキップ
     if not expected_username or not expected_password:
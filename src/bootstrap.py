@@ -0,0 +1,14 @@
+"""起動時の共通初期化。"""
+
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """.env を読み込む（プロセス内で1回だけ。Streamlitの再実行ごとには読み直さない）。
+
+    .env の変更反映は env_watcher が load_dotenv(override=True) で行う。
+    """
+    load_dotenv()
@@ -12,6 +12,16 @@ def get_env_hash():
             return hashlib.md5(f.read()).hexdigest()
     return None
 
+def _clear_env_dependent_caches():
+    """環境変数から算出してキャッシュしている値を破棄"""
+    from auth import get_basic_auth_credentials
+    from services.cloudflare_r2 import load_r2_config_from_env
+    from ui.sidebar import requirements_for_model
+
+    requirements_for_model.clear()
+    get_basic_auth_credentials.cache_clear()
+    load_r2_config_from_env.cache_clear()
+
 def check_env_changes():
     """環境変数の変更をチェックして必要に応じてリロード"""
     # app_settingsをimportして自動リロード設定を確認
@@ -32,6 +42,7 @@ def check_env_changes():
     # ハッシュ値が変更されていたら環境変数を再読み込み
     if current_hash != st.session_state.env_hash:
         load_dotenv(override=True)  # 強制的に再読み込み
+        _clear_env_dependent_caches()
         st.session_state.env_hash = current_hash
         st.rerun()  # アプリを再実行
         
@@ -72,4 +83,5 @@ def display_env_status(sidebar=True):
                 
         if st.button("🔄 環境変数を再読み込み"):
             load_dotenv(override=True)
+            _clear_env_dependent_caches()
             st.rerun()
@@ -1,11 +1,16 @@
 import logging
+import struct
+import threading
 import time
 import os
-from array import array
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Sequence
 
-from dotenv import load_dotenv
+import json
+
+import numpy as np
 from sqlalchemy import (
     JSON,
     Column,
@@ -16,20 +21,30 @@ from sqlalchemy import (
     String,
     Text,
     Boolean,
+    bindparam,
     create_engine,
+    event,
+    insert,
     inspect,
     text,
 )
 from sqlalchemy.engine import make_url
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.types import UserDefinedType
 
+from bootstrap import load_env
+
 # Postgres(pgvector)対応は廃止。libSQL専用。
 
 # .envファイルを読み込む
-load_dotenv()
+load_env()
+
+try:
+    import orjson  # 任意: JSONカラムのシリアライズを高速化
+except ImportError:  # pragma: no cover - orjson 未導入環境
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +53,11 @@ Base = declarative_base()
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
 
 
+def _utcnow() -> datetime:
+    """naiveなUTC現在時刻（非推奨の datetime.utcnow と同じ形式で保存する）。"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 def _is_libsql(url: str) -> bool:
     try:
         drivername = make_url(url).drivername
@@ -80,11 +100,11 @@ class AudioTranscription(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     file_path = Column(String(500), nullable=False)
-    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.now, index=True)
     duration_seconds = Column(Float, nullable=False)
     transcript = Column(Text, nullable=False)
     structured_json = Column(JSON, nullable=True)
-    tags = Column(String(200), nullable=True)
+    tags = Column(String(200), nullable=True, index=True)
     model_id = Column(String(100), nullable=True)
     language_code = Column(String(10), nullable=True)
     chunks = relationship(
@@ -140,14 +160,19 @@ class LibSQLF32Vector(UserDefinedType):
         return f"F32_BLOB({self.dimension})"
 
     def bind_processor(self, dialect):  # type: ignore[override]
+        dimension = self.dimension
+        expected_bytes = dimension * 4
+
         def process(value):
             if value is None:
                 return None
             if isinstance(value, (bytes, bytearray, memoryview)):
-                raw = bytes(value)
-            else:
-                raw = _vector_to_f32_blob(value, self.dimension)
-            return raw
+                # 既にF32バイト列ならコピーせずそのまま渡す（長さ不一致時のみ詰め直す）
+                raw = value if isinstance(value, bytes) else bytes(value)
+                if len(raw) == expected_bytes:
+                    return raw
+                return _vector_to_f32_blob(np.frombuffer(raw, dtype=np.float32), dimension)
+            return _vector_to_f32_blob(value, dimension)
 
         return process
 
@@ -161,34 +186,42 @@ class LibSQLF32Vector(UserDefinedType):
 
     @property
     def python_type(self):  # type: ignore[override]
-        return list
+        return np.ndarray
 
     def _compiler_dispatch(self, visitor, **kw):  # pragma: no cover - dialect固有
         """型のコンパイル処理をF32_BLOBにフォールバック。"""
         return visitor.visit_user_defined_type(self, **kw)
 
 
-def _vector_to_f32_blob(values: Sequence[float], dimension: int) -> bytes:
-    arr = array('f', (float(v) for v in values))
-    length = len(arr)
-    if length != dimension:
-        if length > dimension:
-            arr = arr[:dimension]
-        else:
-            arr.extend((0.0,) * (dimension - length))
-    return arr.tobytes()
+@lru_cache(maxsize=None)
+def _f32_packer(dimension: int):
+    """次元ごとに固定長の float32 パッカーを1度だけ生成する。"""
+    return struct.Struct(f"<{dimension}f").pack
 
 
-def _blob_to_vector(blob: bytes, dimension: int) -> list[float]:
-    if isinstance(blob, memoryview):
-        data = blob.tobytes()
-    else:
-        data = bytes(blob)
-    arr = array('f')
-    arr.frombytes(data)
-    if len(arr) > dimension:
-        arr = arr[:dimension]
-    return list(arr)
+def _vector_to_f32_blob(values: Sequence[float], dimension: int) -> bytes:
+    # API応答の list は固定長 struct で直接パックする（ndarray を経由しない）
+    if type(values) is list and len(values) == dimension:
+        return _f32_packer(dimension)(*values)
+    # float32 の ndarray はコピーせずそのまま使う
+    arr = np.asarray(values, dtype=np.float32).ravel()
+    if arr.size == dimension:
+        return arr.tobytes()
+    # 次元不一致は確保済みバッファへ切り詰め/ゼロ埋め
+    buf = np.zeros(dimension, dtype=np.float32)
+    n = min(arr.size, dimension)
+    buf[:n] = arr[:n]
+    return buf.tobytes()
+
+
+def _blob_to_vector(blob: bytes, dimension: int) -> np.ndarray:
+    """F32_BLOB を float32 の ndarray（読み取り専用ビュー）に変換する。"""
+    arr = np.frombuffer(blob, dtype=np.float32)
+    if arr.size > dimension:
+        return arr[:dimension]
+    if arr.size < dimension:
+        return np.pad(arr, (0, dimension - arr.size))
+    return arr
 
 
 if IS_LIBSQL:
@@ -198,6 +231,27 @@ else:
 
 USE_VECTOR = VECTOR_BACKEND is not None
 LIBSQL_VECTOR_INDEX_NAME = "audio_transcription_chunks_embedding_idx"
+# ANN(DiskANN)インデックスの設定。max_neighbors を小さくすると索引サイズ・挿入コストが下がる
+LIBSQL_VECTOR_MAX_NEIGHBORS = os.getenv("LIBSQL_VECTOR_MAX_NEIGHBORS", "").strip()
+# 索引内の近傍ベクトルを量子化して保持する（float8 で1/4、float1bit で1/32）。
+# 候補探索のみ量子化ベクトルで行い、スコアは基表の float32 で計算し直す。既存索引は再作成が必要
+LIBSQL_VECTOR_COMPRESS_NEIGHBORS = os.getenv("LIBSQL_VECTOR_COMPRESS_NEIGHBORS", "").strip().lower()
+_LIBSQL_COMPRESS_NEIGHBORS_TYPES = {"float1bit", "float8", "float16", "floatb16", "float32"}
+# 検索時に辿る候補リストの幅（HNSW の ef_search 相当）。大きいほど再現率↑・遅くなる
+LIBSQL_VECTOR_SEARCH_L = os.getenv("LIBSQL_VECTOR_SEARCH_L", "").strip()
+
+
+def _libsql_vector_index_options() -> str:
+    options = ["'metric=cosine'"]
+    if LIBSQL_VECTOR_MAX_NEIGHBORS:
+        options.append(f"'max_neighbors={int(LIBSQL_VECTOR_MAX_NEIGHBORS)}'")
+    if LIBSQL_VECTOR_SEARCH_L:
+        options.append(f"'search_l={int(LIBSQL_VECTOR_SEARCH_L)}'")
+    if LIBSQL_VECTOR_COMPRESS_NEIGHBORS in _LIBSQL_COMPRESS_NEIGHBORS_TYPES:
+        options.append(f"'compress_neighbors={LIBSQL_VECTOR_COMPRESS_NEIGHBORS}'")
+    elif LIBSQL_VECTOR_COMPRESS_NEIGHBORS:
+        logger.warning("LIBSQL_VECTOR_COMPRESS_NEIGHBORS の値が不正なため無視します: %s", LIBSQL_VECTOR_COMPRESS_NEIGHBORS)
+    return ", ".join(options)
 
 
 class AudioTranscriptionChunk(Base):
@@ -216,7 +270,7 @@ class AudioTranscriptionChunk(Base):
     else:
         # ローカルSQLite（非libSQL）の場合はRAG無効のためJSONで可
         embedding = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=_utcnow, nullable=False)
 
     transcription = relationship("AudioTranscription", back_populates="chunks")
 
@@ -226,7 +280,7 @@ class RAGChatLog(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String(36), nullable=True, index=True)  # セッション管理用UUID
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=_utcnow, nullable=False)
     user_text = Column(Text, nullable=False)
     answer_text = Column(Text, nullable=True)
     contexts = Column(JSON, nullable=True)  # 参照したチャンクやスコアを保持
@@ -234,10 +288,24 @@ class RAGChatLog(Base):
     alpha = Column(Float, nullable=True)
     date_filter_applied = Column(Boolean, default=False, nullable=True)  # 日付フィルタ適用有無
 
+def _orjson_serializer(value) -> str:
+    try:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    except TypeError:
+        # orjson が扱えない型は標準jsonにフォールバック
+        return json.dumps(value)
+
+
 # データベース接続設定
 engine_kwargs = dict(echo=False)
+if orjson is not None:
+    # JSONカラム（structured_json / contexts）の行ごとの dumps/loads を orjson に置き換える
+    engine_kwargs["json_serializer"] = _orjson_serializer
+    engine_kwargs["json_deserializer"] = orjson.loads
 if IS_LIBSQL:
     engine_kwargs["pool_pre_ping"] = True
+    # リモート側でアイドル切断された接続を使い回さないよう定期的に張り直す
+    engine_kwargs["pool_recycle"] = int(os.getenv("LIBSQL_POOL_RECYCLE_SECONDS", "1800"))
 
 if IS_LIBSQL:
     connect_args = {}
@@ -251,7 +319,50 @@ if IS_LIBSQL:
     else:
         engine = create_engine(url_for_engine, **engine_kwargs)
 else:
-    engine = create_engine(DATABASE_URL, **engine_kwargs)
+    _url = make_url(DATABASE_URL)
+    if _url.get_backend_name() == "sqlite":
+        # 書き込みロック競合時は即エラーにせず待つ
+        sqlite_connect_args = {"timeout": 30}
+        if _url.database in (None, "", ":memory:"):
+            # インメモリDBはスレッド（Streamlitの各実行）間で同じ接続を共有する
+            sqlite_connect_args["check_same_thread"] = False
+            engine_kwargs["poolclass"] = StaticPool
+        else:
+            # ファイルDBは QueuePool。RAG検索の同時実行でプール待ちにならないよう拡げる
+            engine_kwargs["pool_size"] = int(os.getenv("SQLITE_POOL_SIZE", "10"))
+            engine_kwargs["max_overflow"] = int(os.getenv("SQLITE_MAX_OVERFLOW", "20"))
+        engine = create_engine(DATABASE_URL, connect_args=sqlite_connect_args, **engine_kwargs)
+    else:
+        engine = create_engine(DATABASE_URL, **engine_kwargs)
+
+# ローカルSQLite向けのPRAGMA（WAL + synchronous=NORMAL で書き込みごとの完全fsyncを避ける）
+# STT_SQLITE_SAFE=1 の場合は synchronous=FULL を維持する
+SQLITE_SAFE = os.getenv("STT_SQLITE_SAFE", "").lower() in ("1", "true", "yes", "on")
+# ページキャッシュ（KiB）。読み取り中心のRAG検索向けに既定64MB
+SQLITE_CACHE_SIZE_KB = int(os.getenv("STT_SQLITE_CACHE_SIZE_KB", "65536"))
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=FULL" if SQLITE_SAFE else "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# libSQL でもリモート（Turso）ではなくローカルファイルを開く場合は同じPRAGMAを適用する
+_APPLY_SQLITE_PRAGMAS = engine.url.get_backend_name() == "sqlite" and (
+    not IS_LIBSQL or (not engine.url.host and engine.url.database not in (None, "", ":memory:"))
+)
+
+if _APPLY_SQLITE_PRAGMAS:
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in _SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
 
 # Postgres向けの初期化は削除（Turso専用化）
 
@@ -313,21 +424,86 @@ _ensure_columns(
     },
 )
 
-# セッション作成
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _ensure_indexes(statements: list[str]) -> None:
+    """既存テーブルに不足インデックスを追加する。
 
-if IS_LIBSQL:
+    create_allはテーブル新規作成時にしかインデックスを張らないため、
+    既存DB向けに `CREATE INDEX IF NOT EXISTS` で補完する。
+    """
+
+    try:
+        with engine.begin() as connection:
+            for stmt in statements:
+                connection.execute(text(stmt))
+    except Exception as exc:
+        logger.warning("インデックスの作成に失敗: %s", exc)
+
+
+_ensure_indexes(
+    [
+        # DBタブのタグ絞り込み（WHERE tags = ?）用
+        "CREATE INDEX IF NOT EXISTS ix_audio_transcriptions_tags ON audio_transcriptions(tags)",
+        # 一覧の新しい順ソート・RAGの日付絞り込み用
+        "CREATE INDEX IF NOT EXISTS ix_audio_transcriptions_created_at ON audio_transcriptions(created_at)",
+        # 社長音声DBタブの ORDER BY recorded_at DESC, created_at DESC 用
+        "CREATE INDEX IF NOT EXISTS ix_ceo_transcriptions_recorded_created "
+        "ON ceo_transcriptions(recorded_at DESC, created_at DESC)",
+    ]
+)
+
+# セッション作成（commit後に属性を再SELECTしないよう expire_on_commit=False）
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# libSQL初期化で作成するオブジェクト（すべて存在すれば初期化済みとみなす）
+_LIBSQL_SCHEMA_OBJECTS = (
+    LIBSQL_VECTOR_INDEX_NAME,
+    "idx_chunks_by_transcription",
+    "audio_transcription_chunks_fts",
+    "audio_transcription_chunks_ai",
+    "audio_transcription_chunks_ad",
+    "audio_transcription_chunks_au",
+)
+
+
+# 一括再索引（deferred_chunk_indexes）で外して作り直すため、定義を共通化しておく
+_CREATE_VECTOR_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS "
+    f"{LIBSQL_VECTOR_INDEX_NAME} "
+    f"ON audio_transcription_chunks(libsql_vector_idx(embedding, {_libsql_vector_index_options()}))"
+)
+_CREATE_FTS_INSERT_TRIGGER_SQL = (
+    "CREATE TRIGGER IF NOT EXISTS audio_transcription_chunks_ai "
+    "AFTER INSERT ON audio_transcription_chunks BEGIN\n"
+    "  INSERT INTO audio_transcription_chunks_fts(rowid, chunk_text) VALUES (new.id, new.chunk_text);\n"
+    "END;"
+)
+
+
+def _libsql_schema_ready() -> bool:
+    """ベクトルインデックス・FTS・トリガが作成済みかを sqlite_master の1クエリで確認する。"""
+
+    try:
+        with engine.connect() as connection:
+            names = set(
+                connection.execute(
+                    text("SELECT name FROM sqlite_master WHERE name IN :names").bindparams(
+                        bindparam("names", expanding=True)
+                    ),
+                    {"names": list(_LIBSQL_SCHEMA_OBJECTS)},
+                ).scalars()
+            )
+    except Exception as exc:
+        logger.debug("libSQLスキーマ確認に失敗（初期化を実行）: %s", exc)
+        return False
+    return names >= set(_LIBSQL_SCHEMA_OBJECTS)
+
+
+if IS_LIBSQL and not _libsql_schema_ready():
     _t2 = time.time()
     try:
         with engine.begin() as connection:
             # ベクトル式インデックス（正しい構文: USING ではなく式）
-            connection.execute(
-                text(
-                    "CREATE INDEX IF NOT EXISTS "
-                    f"{LIBSQL_VECTOR_INDEX_NAME} "
-                    "ON audio_transcription_chunks(libsql_vector_idx(embedding))"
-                )
-            )
+            connection.execute(text(_CREATE_VECTOR_INDEX_SQL))
 
             # RAG用の補助インデックス（削除・再作成の高速化）
             connection.execute(
@@ -351,14 +527,7 @@ if IS_LIBSQL:
             )
 
             # 追従トリガ
-            connection.execute(
-                text(
-                    "CREATE TRIGGER IF NOT EXISTS audio_transcription_chunks_ai "
-                    "AFTER INSERT ON audio_transcription_chunks BEGIN\n"
-                    "  INSERT INTO audio_transcription_chunks_fts(rowid, chunk_text) VALUES (new.id, new.chunk_text);\n"
-                    "END;"
-                )
-            )
+            connection.execute(text(_CREATE_FTS_INSERT_TRIGGER_SQL))
 
             connection.execute(
                 text(
@@ -378,28 +547,6 @@ if IS_LIBSQL:
                     "END;"
                 )
             )
-
-            # 'rebuild' は高コストのため、必要時のみ実行する
-            # 条件: FTSテーブルが空 かつ 基表にデータがある場合のみ
-            try:
-                fts_count = connection.execute(
-                    text("SELECT COUNT(*) FROM audio_transcription_chunks_fts")
-                ).scalar()
-            except Exception:
-                fts_count = 0
-            try:
-                base_count = connection.execute(
-                    text("SELECT COUNT(*) FROM audio_transcription_chunks")
-                ).scalar()
-            except Exception:
-                base_count = 0
-
-            if (fts_count or 0) == 0 and (base_count or 0) > 0:
-                connection.execute(
-                    text(
-                        "INSERT INTO audio_transcription_chunks_fts(audio_transcription_chunks_fts) VALUES('rebuild')"
-                    )
-                )
     except Exception as exc:  # pragma: no cover - 初期化時の警告
         logger.warning("libSQLの初期化（ベクトル/FTS）に失敗: %s", exc)
     finally:
@@ -409,9 +556,130 @@ if IS_LIBSQL:
         except Exception:
             pass
 
+# FTSインデックスが利用可能になったら set。未 set の間（起動時の再構築中）だけ検索側がLIKEで代替する
+# （検索語が取り出せない場合も同様）。MATCH の実行エラーではLIKEに落とさず例外を送出する
+FTS_READY = threading.Event()
+
+
+def _rebuild_fts_if_needed() -> None:
+    """FTSの索引件数が基表と食い違う場合のみ 'rebuild' する。
+
+    外部コンテンツ型FTS5の COUNT(*) は基表を数えるため、索引済み件数は
+    shadowテーブル `_docsize` で判定する。以降はトリガで同期されるので、
+    一度確認したら `fts_state` に印を残して次回起動時の全件COUNTを省く
+    （再確認したい場合は key='rebuilt' の行を削除する）。
+    起動を塞がないよう別スレッドで実行する。
+    """
+
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text("CREATE TABLE IF NOT EXISTS fts_state (key TEXT PRIMARY KEY, value TEXT)")
+            )
+            checked = connection.execute(
+                text("SELECT value FROM fts_state WHERE key = 'rebuilt'")
+            ).scalar()
+            if checked:
+                return
+            indexed = connection.execute(
+                text("SELECT COUNT(*) FROM audio_transcription_chunks_fts_docsize")
+            ).scalar() or 0
+            base = connection.execute(
+                text("SELECT COUNT(*) FROM audio_transcription_chunks")
+            ).scalar() or 0
+            if indexed != base:
+                logger.info("FTSを再構築します (indexed=%s, base=%s)", indexed, base)
+                connection.execute(
+                    text(
+                        "INSERT INTO audio_transcription_chunks_fts(audio_transcription_chunks_fts) VALUES('rebuild')"
+                    )
+                )
+            connection.execute(
+                text("INSERT OR REPLACE INTO fts_state (key, value) VALUES ('rebuilt', datetime('now'))")
+            )
+    except Exception as exc:
+        logger.warning("FTSの再構築に失敗: %s", exc)
+    finally:
+        FTS_READY.set()
+
+
+if IS_LIBSQL:
+    threading.Thread(target=_rebuild_fts_if_needed, name="fts-rebuild", daemon=True).start()
+else:
+    FTS_READY.set()
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# bulk_insert_chunks で1回の executemany に載せる最大行数
+BULK_INSERT_PAGE_SIZE = int(os.getenv("BULK_INSERT_PAGE_SIZE", "500"))
+
+
+def bulk_insert_chunks(db, rows: list[dict]) -> None:
+    """チャンク行（dict）をまとめて INSERT する（executemany）。commit は呼び出し側で行う。
+
+    libSQLでは埋め込みを事前にF32バイト列へ変換し（bind時はそのまま渡る）、
+    BULK_INSERT_PAGE_SIZE 行ごとに分割して送る。
+    """
+    if not rows:
+        return
+    # 行ごとの default 呼び出しを避け、バッチで同一の作成時刻を使う
+    now = _utcnow()
+    for row in rows:
+        row.setdefault("created_at", now)
+        if VECTOR_BACKEND == "libsql" and not isinstance(row.get("embedding"), (bytes, type(None))):
+            row["embedding"] = _vector_to_f32_blob(row["embedding"], EMBEDDING_DIM)
+    for start in range(0, len(rows), BULK_INSERT_PAGE_SIZE):
+        db.execute(insert(AudioTranscriptionChunk), rows[start:start + BULK_INSERT_PAGE_SIZE])
+
+
+def _restore_chunk_indexes(db) -> None:
+    """deferred_chunk_indexes で外したFTS追従トリガとベクトル索引を作り直す。"""
+    db.execute(
+        text("INSERT INTO audio_transcription_chunks_fts(audio_transcription_chunks_fts) VALUES('rebuild')")
+    )
+    db.execute(text(_CREATE_FTS_INSERT_TRIGGER_SQL))
+    db.execute(text(_CREATE_VECTOR_INDEX_SQL))
+    db.commit()
+
+
+@contextmanager
+def deferred_chunk_indexes(db):
+    """大量の再索引中だけベクトル索引とFTS追従トリガ（INSERT）を外す。
+
+    行ごとの索引更新を避け、終了時にFTSを 'rebuild' してから索引・トリガを作り直す。
+    ブロック内の INSERT は commit 済みでも構わない。libSQL 以外では何もしない。
+    注意: 共有DB上の索引を外すため、実行中はアプリ側のベクトル検索が失敗し、FTSも古い
+    結果を返す。アプリを停止した状態でのみ使うこと。
+    """
+    if not IS_LIBSQL:
+        yield
+        return
+    db.execute(text(f"DROP INDEX IF EXISTS {LIBSQL_VECTOR_INDEX_NAME}"))
+    db.execute(text("DROP TRIGGER IF EXISTS audio_transcription_chunks_ai"))
+    db.commit()
+    try:
+        yield
+    except BaseException:
+        # 元の例外を優先して送出し、復旧の失敗はログに残す
+        db.rollback()
+        try:
+            _restore_chunk_indexes(db)
+        except Exception:
+            db.rollback()
+            logger.exception(
+                "ベクトル索引/FTSトリガの再作成に失敗しました。アプリ再起動前に手動で再作成してください"
+            )
+        raise
+    try:
+        _restore_chunk_indexes(db)
+    except Exception:
+        db.rollback()
+        logger.error("ベクトル索引/FTSトリガの再作成に失敗しました。アプリ再起動前に手動で再作成してください")
+        raise
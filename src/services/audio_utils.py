@@ -1,16 +1,20 @@
 import hashlib
 import logging
+import os
 from pathlib import Path
+import shutil
 import subprocess
 
-import librosa
-import soundfile as sf
-
 logger = logging.getLogger(__name__)
 
+# ffmpeg があれば WebM → WAV 変換を外部プロセスに任せる（Python 側でデコードしない）
+USE_FFMPEG_CONVERT = os.getenv("STT_FFMPEG_CONVERT", "true").lower() in {"1", "true", "yes", "on"}
+FFMPEG_TIMEOUT_SECONDS = int(os.getenv("STT_FFMPEG_TIMEOUT_SECONDS", "600"))
+
 
-def md5_bytes(data: bytes) -> str:
-    return hashlib.md5(data).hexdigest()
+def digest_bytes(data: bytes) -> str:
+    """録音の重複判定用ダイジェスト（セッション内比較のみなので MD5 互換は不要）。"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
 
 def should_convert_to_wav(model_name: str) -> bool:
@@ -21,22 +25,99 @@ def should_convert_to_wav(model_name: str) -> bool:
     ]
 
 
+def _read_with_soundfile(src_path: str, target_sr: int):
+    """libsndfile で読める形式（WAV/FLAC/OGG 等）を librosa を介さずに読み込む。
+    リサンプルが必要な場合は soxr を使い、読めない/未導入なら None を返す。
+    """
+    import soundfile as sf
+
+    try:
+        audio_data, sr = sf.read(src_path, dtype="float32", always_2d=False)
+    except Exception:
+        return None
+    if audio_data.ndim > 1:
+        audio_data = audio_data.mean(axis=1)
+    if sr != target_sr:
+        try:
+            import soxr
+        except ImportError:
+            return None
+        audio_data = soxr.resample(audio_data, sr, target_sr)
+    return audio_data, target_sr
+
+
+def _convert_with_ffmpeg(src_path: str, wav_path: str, target_sr: int) -> bool:
+    """ffmpeg でリサンプル・モノラル化・16bit PCM 化を行う。使えない/失敗時は False。"""
+    if not USE_FFMPEG_CONVERT or shutil.which("ffmpeg") is None:
+        return False
+    try:
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-v",
+                "error",
+                "-i",
+                src_path,
+                "-ar",
+                str(target_sr),
+                "-ac",
+                "1",
+                "-c:a",
+                "pcm_s16le",
+                wav_path,
+            ],
+            check=True,
+            capture_output=True,
+            timeout=FFMPEG_TIMEOUT_SECONDS,
+        )
+        return True
+    except Exception as e:
+        logger.warning("ffmpeg での変換に失敗したため librosa で再試行します: %s", e)
+        return False
+
+
 def convert_webm_to_wav(src_path: str, target_sr: int = 16000) -> tuple[str, float]:
-    """WebM → WAV 変換し、(wav_path, duration_sec) を返す。
+    """WebM → WAV（target_sr / mono / 16bit PCM）変換し、(wav_path, duration_sec) を返す。
     失敗時は例外を送出する。
     """
-    audio_data, sr = librosa.load(src_path, sr=target_sr)
-    duration = len(audio_data) / sr
+    # librosa/soundfile は import が重いため、使用時に読み込む
+    import soundfile as sf
+
     wav_path = str(Path(src_path).with_suffix('.wav'))
-    sf.write(wav_path, audio_data, sr)
+    if _convert_with_ffmpeg(src_path, wav_path, target_sr):
+        # 出力 WAV のヘッダから長さを取る（WebM は duration を持たないことが多い）
+        return wav_path, float(sf.info(wav_path).duration)
+
+    loaded = _read_with_soundfile(src_path, target_sr)
+    if loaded is None:
+        # libsndfile 非対応のコンテナ（WebM/Opus 等）のみ librosa でデコードする
+        import librosa
+
+        loaded = librosa.load(src_path, sr=target_sr, mono=True)
+    audio_data, sr = loaded
+    duration = len(audio_data) / sr
+    # STT送信量を抑えるため float ではなく 16bit PCM で書き出す
+    sf.write(wav_path, audio_data, sr, subtype="PCM_16")
     return wav_path, duration
 
 
 def get_audio_duration(src_path: str, target_sr: int = 16000) -> float:
-    """Return duration seconds by decoding audio locally.
-    Falls back to 0.0 on error to avoid breaking flows.
+    """Return duration seconds, reading only the header when possible.
+    Falls back to decoding, and to 0.0 on error to avoid breaking flows.
     """
     try:
+        import soundfile as sf
+
+        duration = float(sf.info(src_path).duration or 0.0)
+        if duration > 0:
+            return duration
+    except Exception:
+        pass
+
+    try:
+        import librosa
+
         audio_data, sr = librosa.load(src_path, sr=target_sr)
         return len(audio_data) / sr
     except Exception:
@@ -47,6 +128,8 @@ def get_audio_duration_metadata(src_path: str) -> float:
     """Return duration from container metadata without decoding the whole file."""
 
     try:
+        import soundfile as sf
+
         info = sf.info(src_path)
         return float(info.duration or 0.0)
     except Exception:
@@ -77,6 +160,8 @@ def get_audio_duration_metadata(src_path: str) -> float:
         pass
 
     try:
+        import librosa
+
         return float(librosa.get_duration(path=src_path))
     except Exception:
         return 0.0
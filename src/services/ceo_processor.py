@@ -332,9 +332,10 @@ def _save_vad_output(source_vad_path: str, base_file_name: str) -> str:
         candidate = out_dir / f"{stem}_{timestamp}{suffix}.wav"
         if not candidate.exists():
             try:
-                shutil.move(source_vad_path, candidate)
-            except Exception:
-                # 同一 FS でない場合はコピー → 一時ファイルは _process_single 側で削除
+                os.replace(source_vad_path, candidate)
+            except OSError:
+                # 同一 FS でない場合はカーネル内コピー（メタデータは複製しない）
+                # → 一時ファイルは _process_single 側で削除
                 shutil.copyfile(source_vad_path, candidate)
                 try:
                     os.unlink(source_vad_path)
@@ -508,7 +509,6 @@ def process_ceo_uploaded_path(
             )
             db.add(record)
             db.commit()
-            db.refresh(record)
             result.record_id = record.id
         except Exception:
             db.rollback()
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import logging
 import os
+import threading
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.awsrequest import AWSHTTPSConnection, AWSHTTPSConnectionPool
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+@dataclass(frozen=True)
 class R2Config:
     account_id: str
     access_key_id: str
@@ -19,7 +26,9 @@ class R2Config:
     public_base_url: Optional[str] = None  # e.g. https://pub-xxxxxx.r2.dev/my-bucket
 
 
+@lru_cache(maxsize=1)
 def load_r2_config_from_env() -> Optional[R2Config]:
+    """R2_* 環境変数から設定を作る（.env 再読み込み時は env_watcher が cache_clear する）。"""
     account_id = os.getenv("R2_ACCOUNT_ID")
     access_key_id = os.getenv("R2_ACCESS_KEY_ID")
     secret_access_key = os.getenv("R2_SECRET_ACCESS_KEY")
@@ -43,35 +52,94 @@ def load_r2_config_from_env() -> Optional[R2Config]:
     )
 
 
-def _build_s3_client(cfg: R2Config):
-    endpoint = f"https://{cfg.account_id}.r2.cloudflarestorage.com"
-    session = boto3.session.Session()
-    s3 = session.client(
-        "s3",
-        endpoint_url=endpoint,
-        aws_access_key_id=cfg.access_key_id,
-        aws_secret_access_key=cfg.secret_access_key,
-        region_name="auto",
-        config=Config(signature_version="s3v4"),
-    )
+# 音声ファイル（数十〜数百MB）向けのマルチパート設定。既定の 8MB パートより大きくして往復回数を減らす
+R2_MULTIPART_CHUNK_MB = int(os.getenv("R2_MULTIPART_CHUNK_MB", "32"))
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=R2_MULTIPART_CHUNK_MB * 1024 * 1024,
+    multipart_chunksize=R2_MULTIPART_CHUNK_MB * 1024 * 1024,
+    max_concurrency=8,
+    max_io_queue=1000,
+    io_chunksize=1024 * 1024,
+    use_threads=True,
+)
+
+# urllib3 はソケットへ blocksize 単位で書き込む（HTTPSConnection 既定 16KB、新しい botocore は 128KB を
+# 指定）。大きなアップロードでは書き込みのたびにGILの取得が発生するため、
+# R2_BIG_WRITE_BUFFER=1 で R2 クライアントの接続だけ 1MB に拡げる
+R2_BIG_WRITE_BUFFER = os.getenv("R2_BIG_WRITE_BUFFER", "").lower() in {"1", "true", "yes", "on"}
+_WRITE_BLOCKSIZE = 1024 * 1024
+
+
+class _BigWriteHTTPSConnection(AWSHTTPSConnection):
+    """送信ブロックサイズを拡げた HTTPS 接続。プール側から渡される値より小さくはしない。"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs["blocksize"] = max(kwargs.get("blocksize") or 0, _WRITE_BLOCKSIZE)
+        super().__init__(*args, **kwargs)
+
+
+class _BigWriteHTTPSConnectionPool(AWSHTTPSConnectionPool):
+    ConnectionCls = _BigWriteHTTPSConnection
+
+
+def _use_big_write_buffer(s3) -> None:
+    """このクライアントの HTTPS 接続プールだけを差し替える（他の HTTP 利用には影響しない）。
+
+    botocore の URLLib3Session は pool_classes_by_scheme の dict を PoolManager と共有しているため、
+    接続を張る前に https のプールクラスを置き換えれば以降の接続に効く。
+    """
+    try:
+        s3._endpoint.http_session._pool_classes_by_scheme["https"] = _BigWriteHTTPSConnectionPool
+        # 接続クラスが blocksize を実際に保持するか確認する（接続は張らない）
+        blocksize = getattr(_BigWriteHTTPSConnection("r2.invalid"), "blocksize", None)
+    except Exception as exc:  # botocore の内部構造が変わった場合は既定のまま使う
+        logger.warning("R2: 送信ブロックサイズの変更をスキップ: %s", exc)
+        return
+    if blocksize != _WRITE_BLOCKSIZE:
+        logger.warning("R2: 送信ブロックサイズが反映されていません (expected=%s, actual=%s)", _WRITE_BLOCKSIZE, blocksize)
+
+
+# botocore のセッション初期化はスレッドセーフではないため、生成時のみ直列化する
+_CLIENT_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _get_cached_client(account_id: str, access_key_id: str, secret_access_key: str):
+    """認証情報ごとに S3 クライアントを1度だけ生成して使い回す（署名はメモリ内で完結）。"""
+    endpoint = f"https://{account_id}.r2.cloudflarestorage.com"
+    with _CLIENT_LOCK:
+        session = boto3.session.Session()
+        s3 = session.client(
+            "s3",
+            endpoint_url=endpoint,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            region_name="auto",
+            config=Config(signature_version="s3v4"),
+        )
+    if R2_BIG_WRITE_BUFFER:
+        _use_big_write_buffer(s3)
     return s3
 
 
+def _build_s3_client(cfg: R2Config):
+    return _get_cached_client(cfg.account_id, cfg.access_key_id, cfg.secret_access_key)
+
+
+_CONTENT_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".webm": "audio/webm",
+}
+
+
 def guess_content_type(filename: str) -> str:
-    lower = filename.lower()
-    if lower.endswith(".wav"):
-        return "audio/wav"
-    if lower.endswith(".mp3"):
-        return "audio/mpeg"
-    if lower.endswith(".m4a"):
-        return "audio/mp4"
-    if lower.endswith(".flac"):
-        return "audio/flac"
-    if lower.endswith(".ogg"):
-        return "audio/ogg"
-    if lower.endswith(".webm"):
-        return "audio/webm"
-    return "application/octet-stream"
+    # splitext と違い ".mp3" のような名前も拡張子として扱う（従来の endswith 判定と同じ結果）
+    _, dot, ext = filename.rpartition(".")
+    return _CONTENT_TYPES.get(dot + ext.lower(), "application/octet-stream")
 
 
 def upload_file_to_r2(local_path: str, key: str, cfg: Optional[R2Config] = None) -> dict:
@@ -96,6 +164,7 @@ def upload_file_to_r2(local_path: str, key: str, cfg: Optional[R2Config] = None)
         cfg.bucket_name,
         key,
         ExtraArgs={"ContentType": content_type},
+        Config=_TRANSFER_CONFIG,
     )
 
     url = None
@@ -166,6 +235,34 @@ def generate_presigned_get_url(
         return None
 
 
+def generate_presigned_get_urls(
+    keys: list[str],
+    expires_in: int = 900,
+    cfg: Optional[R2Config] = None,
+) -> dict[str, str]:
+    """複数キーの署名付きGET URLを同じクライアントで生成し {key: url} で返す。
+
+    署名はローカル計算のみ（通信なし）。失敗したキーはログに残して結果に含めない。
+    """
+    if cfg is None:
+        cfg = load_r2_config_from_env()
+    if cfg is None or not keys:
+        return {}
+
+    s3 = _build_s3_client(cfg)
+    urls: dict[str, str] = {}
+    for key in keys:
+        try:
+            urls[key] = s3.generate_presigned_url(
+                ClientMethod="get_object",
+                Params={"Bucket": cfg.bucket_name, "Key": key},
+                ExpiresIn=expires_in,
+            )
+        except Exception as exc:
+            logger.debug("R2: 署名付きURLの生成に失敗 (key=%s): %s", key, exc)
+    return urls
+
+
 def object_exists_in_r2(key: str, cfg: Optional[R2Config] = None) -> bool:
     """Return True if the object exists in the configured R2 bucket."""
     if cfg is None:
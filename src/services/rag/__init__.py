@@ -4,3 +4,4 @@ from .date_utils import parse_date_from_query, highlight_date_in_query, filter_m
 from .chunker import chunk_text
 from .prompt_builder import build_prompt, build_chat_prompt
 from .retriever import LibsqlRetriever
+from .embedding_cache import EmbeddingCache
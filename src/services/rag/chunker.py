@@ -1,44 +1,51 @@
 from __future__ import annotations
 
 import re
-from typing import Iterable, List
+from itertools import chain
+from typing import Iterator, Tuple
 
+# 文末記号（この直後で文を区切る）
+_SENTENCE_END_RE = re.compile(r"[。．.!?！？]")
 
-def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> Iterable[str]:
-    """句点ベースのシンプルなチャンク化。"""
-    if not text:
-        return []
 
-    sentences = [s.strip() for s in re.split(r"(?<=[。．.!?！？])", text) if s and s.strip()]
-    if not sentences:
-        sentences = [text.strip()]
+def _iter_sentence_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """文末記号の位置を順に走査し、前後の空白を除いた文の (開始, 終了) 位置を返す。"""
+    start = 0
+    ends = chain((m.end() for m in _SENTENCE_END_RE.finditer(text)), (len(text),))
+    for end in ends:
+        s, e = start, end
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if s < e:
+            yield s, e
+        start = end
 
-    chunks: List[str] = []
-    current: List[str] = []
-    current_length = 0
 
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-        sentence_length = len(sentence)
-        if current_length + sentence_length <= chunk_size:
-            current.append(sentence)
-            current_length += sentence_length
-            continue
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """句点ベースのシンプルなチャンク化。確定したチャンクから順に返すジェネレータ。
 
-        if current:
-            chunks.append("".join(current))
+    文字列は連結せず元テキスト上の位置だけを追い、チャンク確定時に1回だけスライスする。
+    """
+    if not text:
+        return
 
-        if chunk_overlap > 0 and chunks:
-            overlap_text = chunks[-1][-chunk_overlap:]
-            current = [overlap_text, sentence]
-            current_length = len(overlap_text) + sentence_length
-        else:
-            current = [sentence]
-            current_length = sentence_length
+    chunk_start = -1
+    chunk_end = 0
+
+    for s, e in _iter_sentence_spans(text):
+        if chunk_start < 0:
+            chunk_start, chunk_end = s, e
+            continue
+        if e - chunk_start <= chunk_size:
+            chunk_end = e
+            continue
 
-    if current:
-        chunks.append("".join(current))
+        yield text[chunk_start:chunk_end].strip()
+        # 重複部分は直前チャンクの末尾から始める（元テキスト上で連続している）
+        chunk_start = max(chunk_start, chunk_end - chunk_overlap) if chunk_overlap > 0 else s
+        chunk_end = e
 
-    return chunks
+    if chunk_start >= 0:
+        yield text[chunk_start:chunk_end].strip()
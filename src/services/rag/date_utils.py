@@ -2,53 +2,98 @@ from __future__ import annotations
 
 import re
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 
+# クエリごとに re のキャッシュを引かないよう、パターンはモジュール読み込み時にコンパイルする
+_RE_DAYS_AGO = re.compile(r"(\d+)\s*日前")
+_RE_WEEKS_AGO = re.compile(r"(\d+)\s*週間?前")
+_RE_MONTHS_AGO = re.compile(r"(\d+)\s*[ヶか]?月前")
+_RE_FULL_DATE = re.compile(r"(\d{4})[年/\-](\d{1,2})[月/\-](\d{1,2})日?")
+_RE_MONTH_DAY = re.compile(r"(\d{1,2})[月/\-](\d{1,2})日?")
+
+# ハイライト対象を1つの選択パターンにまとめ、クエリを1回だけ走査する。
+# 左から順に試されるため、長い表現（一昨日・年月日）を短い表現より先に置く
+_HIGHLIGHT_RE = re.compile(
+    "|".join(
+        (
+            r"一昨日",
+            r"おととい",
+            r"今日",
+            r"昨日",
+            r"今週",
+            r"先週",
+            r"今月",
+            r"先月",
+            r"\d+\s*日前",
+            r"\d+\s*週間?前",
+            r"\d+\s*[ヶか]?月前",
+            r"\d{4}[年/\-]\d{1,2}[月/\-]\d{1,2}日?",
+            r"\d{1,2}[月/\-]\d{1,2}日?",
+        )
+    )
+)
+
+
+def _this_week(today: date) -> Tuple[date, date]:
+    start = today - timedelta(days=today.weekday())
+    end = start + timedelta(days=6)
+    return (start, min(end, today))
+
+
+def _last_week(today: date) -> Tuple[date, date]:
+    start = today - timedelta(days=today.weekday() + 7)
+    return (start, start + timedelta(days=6))
+
+
+def _last_month(today: date) -> Tuple[date, date]:
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+    return (last_month_end.replace(day=1), last_month_end)
+
+
+# 相対日付キーワード → 日付範囲。キーワードは1回の走査で検出し、辞書で引く
+_KEYWORD_RANGES = {
+    "今日": lambda today: (today, today),
+    "昨日": lambda today: (today - timedelta(days=1),) * 2,
+    "一昨日": lambda today: (today - timedelta(days=2),) * 2,
+    "おととい": lambda today: (today - timedelta(days=2),) * 2,
+    "今週": _this_week,
+    "先週": _last_week,
+    "今月": lambda today: (today.replace(day=1), today),
+    "先月": _last_month,
+}
+# 「一昨日」が「昨日」より先に試されるよう、長いキーワードから並べる
+_KEYWORD_RE = re.compile("|".join(sorted(_KEYWORD_RANGES, key=len, reverse=True)))
+
 
 def parse_date_from_query(query: str) -> Optional[Tuple[date, date]]:
     """ユーザークエリから日付範囲を抽出する。"""
-    today = date.today()
+    # 結果は「今日」に依存するため、日付も含めてキャッシュする
+    return _parse_date_cached(query, date.today())
+
+
+@lru_cache(maxsize=256)
+def _parse_date_cached(query: str, today: date) -> Optional[Tuple[date, date]]:
     current_year = today.year
 
-    if "今日" in query:
-        return (today, today)
-    if "昨日" in query:
-        y = today - timedelta(days=1)
-        return (y, y)
-    if "一昨日" in query or "おととい" in query:
-        d = today - timedelta(days=2)
-        return (d, d)
-    if "今週" in query:
-        start = today - timedelta(days=today.weekday())
-        end = start + timedelta(days=6)
-        return (start, min(end, today))
-    if "先週" in query:
-        start = today - timedelta(days=today.weekday() + 7)
-        end = start + timedelta(days=6)
-        return (start, end)
-    if "今月" in query:
-        start = today.replace(day=1)
-        return (start, today)
-    if "先月" in query:
-        first = today.replace(day=1)
-        last_month_end = first - timedelta(days=1)
-        last_month_start = last_month_end.replace(day=1)
-        return (last_month_start, last_month_end)
-
-    days_ago = re.search(r"(\d+)\s*日前", query)
+    keyword = _KEYWORD_RE.search(query)
+    if keyword:
+        return _KEYWORD_RANGES[keyword.group(0)](today)
+
+    days_ago = _RE_DAYS_AGO.search(query)
     if days_ago:
         n = int(days_ago.group(1))
         target = today - timedelta(days=n)
         return (target, target)
 
-    weeks_ago = re.search(r"(\d+)\s*週間?前", query)
+    weeks_ago = _RE_WEEKS_AGO.search(query)
     if weeks_ago:
         n = int(weeks_ago.group(1))
         target_end = today - timedelta(weeks=n)
         target_start = target_end - timedelta(days=6)
         return (target_start, target_end)
 
-    months_ago = re.search(r"(\d+)\s*[ヶか]?月前", query)
+    months_ago = _RE_MONTHS_AGO.search(query)
     if months_ago:
         n = int(months_ago.group(1))
         target = today - timedelta(days=30 * n)
@@ -59,7 +104,7 @@ def parse_date_from_query(query: str) -> Optional[Tuple[date, date]]:
             month_end = target.replace(month=target.month + 1, day=1) - timedelta(days=1)
         return (month_start, month_end)
 
-    full_date = re.search(r"(\d{4})[年/\-](\d{1,2})[月/\-](\d{1,2})日?", query)
+    full_date = _RE_FULL_DATE.search(query)
     if full_date:
         try:
             year = int(full_date.group(1))
@@ -70,7 +115,7 @@ def parse_date_from_query(query: str) -> Optional[Tuple[date, date]]:
         except ValueError:
             pass
 
-    month_day = re.search(r"(\d{1,2})[月/\-](\d{1,2})日?", query)
+    month_day = _RE_MONTH_DAY.search(query)
     if month_day:
         try:
             month = int(month_day.group(1))
@@ -85,34 +130,25 @@ def parse_date_from_query(query: str) -> Optional[Tuple[date, date]]:
     return None
 
 
+@lru_cache(maxsize=256)
 def highlight_date_in_query(query: str) -> str:
     """クエリ内の日付表現をStreamlit用にハイライトする。"""
-    result = query
+    return _HIGHLIGHT_RE.sub(lambda m: f":orange[{m.group(0)}]", query)
 
-    def wrap(match: re.Match) -> str:
-        return f":orange[{match.group(0)}]"
 
-    relative_patterns = [
-        r"今日",
-        r"昨日",
-        r"一昨日",
-        r"おととい",
-        r"今週",
-        r"先週",
-        r"今月",
-        r"先月",
-        r"\d+\s*日前",
-        r"\d+\s*週間?前",
-        r"\d+\s*[ヶか]?月前",
-    ]
+def _parse_iso_date(value: str) -> date:
+    """ISO形式（YYYY-MM-DD...）の先頭10文字だけを整数として読み、date を返す。"""
+    if len(value) < 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError(value)
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
 
-    for pattern in relative_patterns:
-        result = re.sub(pattern, wrap, result)
 
-    result = re.sub(r"(\d{4})[年/\-](\d{1,2})[月/\-](\d{1,2})日?", wrap, result)
-    result = re.sub(r"(\d{1,2})[月/\-](\d{1,2})日?", wrap, result)
-
-    return result
+# recorded_at の型 → date への変換（型をキーに1回の辞書引きで分岐する）
+_DATE_CONVERTERS = {
+    str: _parse_iso_date,
+    datetime: datetime.date,
+    date: lambda value: value,
+}
 
 
 def filter_matches_by_date(matches: List[Dict], date_range: Tuple[date, date]) -> List[Dict]:
@@ -123,19 +159,18 @@ def filter_matches_by_date(matches: List[Dict], date_range: Tuple[date, date]) -
         recorded_at = m.get("recorded_at")
         if not recorded_at:
             continue
-        if isinstance(recorded_at, str):
-            try:
-                recorded_date = datetime.fromisoformat(recorded_at.replace("Z", "+00:00")).date()
-            except (ValueError, TypeError):
-                try:
-                    recorded_date = datetime.strptime(recorded_at[:10], "%Y-%m-%d").date()
-                except (ValueError, TypeError):
-                    continue
-        elif isinstance(recorded_at, datetime):
-            recorded_date = recorded_at.date()
-        elif isinstance(recorded_at, date):
-            recorded_date = recorded_at
-        else:
+        convert = _DATE_CONVERTERS.get(type(recorded_at))
+        if convert is None:
+            # pandas.Timestamp などのサブクラスのみ isinstance で判定する
+            if isinstance(recorded_at, datetime):
+                convert = datetime.date
+            elif isinstance(recorded_at, date):
+                convert = _DATE_CONVERTERS[date]
+            else:
+                continue
+        try:
+            recorded_date = convert(recorded_at)
+        except ValueError:
             continue
 
         if start_date <= recorded_date <= end_date:
@@ -0,0 +1,103 @@
+"""埋め込みベクトルのローカル永続キャッシュ（SQLite）。
+
+同じ本文の再インデックスや同一クエリで埋め込みAPIを呼び直さないよう、
+sha256(モデル名 + 本文) をキーに float32 のバイト列で保存する。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# SQLite のバインド変数上限（古いビルドは999）に収まるよう IN 句を分割する
+_LOOKUP_PAGE_SIZE = 500
+# TTL 切れ行の削除間隔（書き込みのたびに全件を見ないよう間引く）
+_PURGE_INTERVAL_SECONDS = 3600
+
+
+class EmbeddingCache:
+    """sha256 キー → float32 ベクトルの永続キャッシュ。失敗しても呼び出し側は動き続ける。"""
+
+    def __init__(self, path: str, model: str, ttl_seconds: Optional[int] = None) -> None:
+        self._model = model
+        self._ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            "key BLOB PRIMARY KEY, vec BLOB NOT NULL, ts INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_cache_ts ON embedding_cache(ts)")
+        self._conn.commit()
+        self._next_purge = 0.0
+        self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        """TTL 切れの行を削除する（読み込み時の除外だけではファイルが増え続けるため）。"""
+        if self._ttl_seconds is None:
+            return
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + _PURGE_INTERVAL_SECONDS
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM embedding_cache WHERE ts < ?", (int(now) - self._ttl_seconds,))
+                self._conn.commit()
+        except sqlite3.Error as exc:
+            logger.warning("RAG: 埋め込みキャッシュの期限切れ削除に失敗: %s", exc)
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256((self._model + "\0" + text).encode("utf-8")).digest()
+
+    def get_many(self, texts: Sequence[str]) -> Tuple[Dict[int, List[float]], List[int]]:
+        """(ヒット: 入力位置→ベクトル, ミスした入力位置) を返す。"""
+        keys = [self._key(t) for t in texts]
+        found: Dict[bytes, bytes] = {}
+        min_ts = int(time.time()) - self._ttl_seconds if self._ttl_seconds else 0
+        unique_keys = list(dict.fromkeys(keys))
+        try:
+            with self._lock:
+                for start in range(0, len(unique_keys), _LOOKUP_PAGE_SIZE):
+                    page = unique_keys[start:start + _LOOKUP_PAGE_SIZE]
+                    placeholders = ",".join("?" * len(page))
+                    rows = self._conn.execute(
+                        f"SELECT key, vec FROM embedding_cache WHERE ts >= ? AND key IN ({placeholders})",
+                        [min_ts, *page],
+                    ).fetchall()
+                    found.update(rows)
+        except sqlite3.Error as exc:
+            logger.warning("RAG: 埋め込みキャッシュの読み込みに失敗: %s", exc)
+            return {}, list(range(len(texts)))
+
+        hits: Dict[int, List[float]] = {}
+        misses: List[int] = []
+        for i, key in enumerate(keys):
+            blob = found.get(key)
+            if blob is None:
+                misses.append(i)
+            else:
+                hits[i] = array("f", blob).tolist()
+        return hits, misses
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = int(time.time())
+        rows = [(self._key(t), array("f", v).tobytes(), now) for t, v in zip(texts, vectors)]
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (key, vec, ts) VALUES (?, ?, ?)", rows
+                )
+                self._conn.commit()
+        except sqlite3.Error as exc:
+            logger.warning("RAG: 埋め込みキャッシュの書き込みに失敗: %s", exc)
+        self._purge_expired()
@@ -1,12 +1,136 @@
 from __future__ import annotations
 
 import json
-from typing import Dict, List, Tuple
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
+import numpy as np
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from models import LIBSQL_VECTOR_INDEX_NAME
+from models import EMBEDDING_DIM, FTS_READY, LIBSQL_VECTOR_INDEX_NAME, _vector_to_f32_blob
+
+
+def _encode_query_vector(query_vector: List[float]) -> bytes:
+    """クエリベクトルをF32 BLOBで渡す（JSON文字列の生成とDB側のJSONパースを省く）。"""
+    return _vector_to_f32_blob(query_vector, EMBEDDING_DIM)
+
+
+# FTS候補をベクトル検索と並行に取得するためのワーカー（I/O待ちのみなのでスレッドで足りる）
+_CANDIDATE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-fts")
+
+
+_FTS_TOKEN_RE = re.compile(r"\w+")
+
+
+def _to_fts_query(query: str) -> str:
+    """ユーザー入力を FTS5 の MATCH 式に変換する。
+
+    記号（: " AND/OR の誤用など）で構文エラーになり全件LIKEに落ちないよう、
+    単語だけを取り出して前方一致のフレーズとして並べる（暗黙のAND）。
+    """
+    return " ".join(f'"{token}"*' for token in _FTS_TOKEN_RE.findall(query))
+
+
+# チャンクID群から本文と親のメタデータを引く。ID列はJSON配列1個のバインドで渡し、
+# 件数によらず常に同一SQL文にする（expanding IN だと件数ごとに文が変わり再準備になる）
+_CHUNK_META_BY_IDS = text(
+    """
+    SELECT
+        chunk.id AS chunk_id,
+        chunk.chunk_text AS chunk_text,
+        chunk.chunk_index AS chunk_index,
+        trans.id AS transcription_id,
+        trans.file_path AS file_path,
+        trans.tags AS tag,
+        trans.created_at AS recorded_at,
+        trans.duration_seconds AS duration
+    FROM audio_transcription_chunks AS chunk
+    JOIN audio_transcriptions AS trans ON trans.id = chunk.transcription_id
+    WHERE chunk.id IN (SELECT value FROM json_each(:ids))
+    """
+)
+
+
+def _ids_param(ids: List[int]) -> str:
+    return json.dumps(ids)
+
+# FTS候補と本文・親メタデータを同じ文で取得する（候補取得→メタ取得の2往復をまとめる）。
+# FTS5 を他表と直接 JOIN するとプランナが基表側から走査する計画を選ぶことがあるため、
+# MATCH と上位 k 件の抽出は LIMIT 付きCTE（平坦化されず先に評価される）に閉じ込めてから結合する
+_FTS_WITH_META = text(
+    """
+    WITH fts AS (
+        SELECT rowid AS id, bm25(audio_transcription_chunks_fts) AS bm25
+        FROM audio_transcription_chunks_fts
+        WHERE audio_transcription_chunks_fts MATCH :q
+        ORDER BY bm25 LIMIT :k
+    )
+    SELECT
+        chunk.id AS chunk_id,
+        chunk.chunk_text AS chunk_text,
+        chunk.chunk_index AS chunk_index,
+        trans.id AS transcription_id,
+        trans.file_path AS file_path,
+        trans.tags AS tag,
+        trans.created_at AS recorded_at,
+        trans.duration_seconds AS duration,
+        fts.bm25 AS bm25
+    FROM fts
+    JOIN audio_transcription_chunks AS chunk ON chunk.id = fts.id
+    JOIN audio_transcriptions AS trans ON trans.id = chunk.transcription_id
+    ORDER BY fts.bm25
+    """
+)
+
+
+# ベクトル近傍＋メタデータ。クエリベクトルはCTEで1回だけ vector32 に変換し、索引検索と距離計算で共用する。
+# vector_top_k は距離を返さないため、スコア用の距離は top_k 件分だけ計算する
+_SIMILARITY_SQL = """
+    WITH q AS (SELECT vector32(:query_vector) AS v)
+    SELECT
+        chunk.id AS chunk_id,
+        chunk.chunk_text AS chunk_text,
+        chunk.chunk_index AS chunk_index,
+        trans.id AS transcription_id,
+        trans.file_path AS file_path,
+        trans.tags AS tag,
+        trans.created_at AS recorded_at,
+        trans.duration_seconds AS duration,
+        vector_distance_cos(chunk.embedding, q.v) AS distance
+    FROM q, vector_top_k(:index_name, q.v, :top_k) AS matches
+    JOIN audio_transcription_chunks AS chunk ON chunk.id = matches.id
+    JOIN audio_transcriptions AS trans ON trans.id = chunk.transcription_id
+    {distance_filter}
+    ORDER BY distance ASC
+"""
+_SIMILARITY = text(_SIMILARITY_SQL.format(distance_filter=""))
+_SIMILARITY_WITHIN_DISTANCE = text(_SIMILARITY_SQL.format(distance_filter="WHERE distance <= :max_distance"))
+
+_VECTOR_CANDIDATES = text(
+    """
+    WITH q AS (SELECT vector32(:q) AS v)
+    SELECT
+        i.id AS id,
+        vector_distance_cos(chunk.embedding, q.v) AS distance
+    FROM q, vector_top_k(:index_name, q.v, :k) AS i
+    JOIN audio_transcription_chunks AS chunk ON chunk.id = i.id
+    """
+)
+
+_FTS_CANDIDATES = text(
+    """
+    SELECT rowid AS id, bm25(audio_transcription_chunks_fts) AS bm25
+    FROM audio_transcription_chunks_fts
+    WHERE audio_transcription_chunks_fts MATCH :q
+    ORDER BY bm25 LIMIT :k
+    """
+)
+
+_LIKE_CANDIDATES = text(
+    "SELECT id, 0.5 AS like_score FROM audio_transcription_chunks WHERE chunk_text LIKE :pat LIMIT :k"
+)
 
 
 class LibsqlRetriever:
@@ -16,34 +140,26 @@ class LibsqlRetriever:
         self.index_name = index_name
 
     # --- 公開メソッド ---
-    def similarity_search(self, db: Session, query_vector: List[float], top_k: int) -> List[Dict]:
-        vector_literal = json.dumps(query_vector)
-        stmt = text(
-            """
-            SELECT
-                chunk.id AS chunk_id,
-                chunk.chunk_text AS chunk_text,
-                chunk.chunk_index AS chunk_index,
-                trans.id AS transcription_id,
-                trans.file_path AS file_path,
-                trans.tags AS tag,
-                trans.created_at AS recorded_at,
-                trans.duration_seconds AS duration,
-                vector_distance_cos(chunk.embedding, vector32(:query_vector)) AS distance
-            FROM vector_top_k(:index_name, vector32(:query_vector), :top_k) AS matches
-            JOIN audio_transcription_chunks AS chunk ON chunk.id = matches.id
-            JOIN audio_transcriptions AS trans ON trans.id = chunk.transcription_id
-            ORDER BY distance ASC
-            """
-        )
+    def similarity_search(
+        self,
+        db: Session,
+        query_vector: List[float],
+        top_k: int,
+        max_distance: Optional[float] = None,
+    ) -> Sequence[Mapping[str, Any]]:
+        """max_distance 指定時は、それより遠い候補をSQL側で除外して転送しない。
 
+        行は読み取り専用の RowMapping のまま返す（呼び出し側で必要な項目だけ詰め替える）。
+        """
+        stmt = _SIMILARITY_WITHIN_DISTANCE if max_distance is not None else _SIMILARITY
         params = {
             "index_name": self.index_name,
-            "query_vector": vector_literal,
+            "query_vector": _encode_query_vector(query_vector),
             "top_k": top_k,
         }
-        rows = db.execute(stmt, params).mappings().all()
-        return [dict(r) for r in rows]
+        if max_distance is not None:
+            params["max_distance"] = max_distance
+        return db.execute(stmt, params).mappings().all()
 
     def hybrid_search(
         self,
@@ -53,139 +169,136 @@ class LibsqlRetriever:
         top_k: int,
         cand_k: int,
         alpha: float,
+        fts_rows: Optional[Sequence[Mapping[str, Any]]] = None,
     ) -> List[Dict]:
-        vec_rows = self._vector_candidates(db, query_vector, cand_k)
-        fts_rows = self._fts_candidates(db, query, cand_k)
+        """fts_rows: 取得済みのFTS候補（fts_candidates の結果）があれば再検索しない。"""
+        if fts_rows is not None:
+            vec_rows = self._vector_candidates(db, query_vector, cand_k)
+        else:
+            # Session はスレッド間で共有できないため、FTS側は別セッションで並行に引く
+            fts_future = _CANDIDATE_EXECUTOR.submit(self._fts_candidates_in_new_session, db, query, cand_k)
+            vec_rows = self._vector_candidates(db, query_vector, cand_k)
+            fts_rows = fts_future.result()
         return self._blend_and_fetch(db, vec_rows, fts_rows, top_k, alpha)
 
-    def fts_only(self, db: Session, query: str, top_k: int) -> List[Dict]:
-        rows = self._fts_candidates(db, query, top_k)
-        ids = [int(r["id"]) for r in rows]
+    def fts_candidates(self, db: Session, query: str, k: int) -> Sequence[Mapping[str, Any]]:
+        """FTS候補（id, bm25）を bm25 昇順で返す。"""
+        return self._fts_candidates(db, query, k)
+
+    def fts_only(
+        self, db: Session, query: str, top_k: int, fts_rows: Optional[Sequence[Mapping[str, Any]]] = None
+    ) -> List[Dict]:
+        if fts_rows is None:
+            joined = self._fts_with_meta(db, query, top_k)
+            if joined is not None:
+                return joined
+        rows = fts_rows[:top_k] if fts_rows is not None else self._fts_candidates(db, query, top_k)
+        ids = [r["id"] for r in rows]
         if not ids:
             return []
-        ids_sql = ",".join(str(int(i)) for i in ids)
-        meta = db.execute(
-            text(
-                f"""
-                SELECT
-                    chunk.id AS chunk_id,
-                    chunk.chunk_text AS chunk_text,
-                    chunk.chunk_index AS chunk_index,
-                    trans.id AS transcription_id,
-                    trans.file_path AS file_path,
-                    trans.tags AS tag,
-                    trans.created_at AS recorded_at,
-                    trans.duration_seconds AS duration
-                FROM audio_transcription_chunks AS chunk
-                JOIN audio_transcriptions AS trans ON trans.id = chunk.transcription_id
-                WHERE chunk.id IN ({ids_sql})
-                """
-            )
-        ).mappings().all()
+        meta = db.execute(_CHUNK_META_BY_IDS, {"ids": _ids_param(ids)}).mappings().all()
 
-        row_map = {int(r["chunk_id"]): r for r in meta}
+        row_map = {r["chunk_id"]: r for r in meta}
         matches: List[Dict] = []
-        for r in rows[:top_k]:
-            base = row_map.get(int(r["id"]))
+        for r in rows:
+            base = row_map.get(r["id"])
             if not base:
                 continue
-            sim_fts = 1.0 / (1.0 + max(0.0, float(r.get("bm25", 1.0))))
+            sim_fts = 1.0 / (1.0 + max(0.0, r.get("bm25", 1.0)))
             rec = dict(base)
-            rec["score"] = float(sim_fts)
+            rec["score"] = sim_fts
             rec["score_vector"] = 0.0
-            rec["score_fts"] = float(sim_fts)
+            rec["score_fts"] = sim_fts
             matches.append(rec)
         return matches
 
     # --- 内部ヘルパー ---
-    def _vector_candidates(self, db: Session, qvec: List[float], k: int) -> List[Dict]:
-        stmt = text(
-            """
-            SELECT
-                i.id AS id,
-                vector_distance_cos(chunk.embedding, vector32(:q)) AS distance
-            FROM vector_top_k(:index_name, vector32(:q), :k) AS i
-            JOIN audio_transcription_chunks AS chunk ON chunk.id = i.id
-            """
-        )
-        rows = db.execute(
-            stmt,
-            {"index_name": self.index_name, "q": json.dumps(qvec), "k": k},
+    def _fts_with_meta(self, db: Session, query: str, top_k: int) -> Optional[List[Dict]]:
+        """FTS検索とメタデータ取得を1文で行う（往復1回）。
+
+        FTSが準備中、または検索語が取り出せない場合は None（呼び出し側がLIKEで代替）。
+        DBエラーは握りつぶさず呼び出し側へ送出する。
+        """
+        fts_query = _to_fts_query(query)
+        if not FTS_READY.is_set() or not fts_query:
+            return None
+        rows = db.execute(_FTS_WITH_META, {"q": fts_query, "k": top_k}).mappings().all()
+        matches: List[Dict] = []
+        for r in rows:
+            rec = dict(r)
+            sim_fts = 1.0 / (1.0 + max(0.0, rec.pop("bm25")))
+            rec["score"] = sim_fts
+            rec["score_vector"] = 0.0
+            rec["score_fts"] = sim_fts
+            matches.append(rec)
+        return matches
+
+    def _vector_candidates(self, db: Session, qvec: List[float], k: int) -> Sequence[Mapping[str, Any]]:
+        return db.execute(
+            _VECTOR_CANDIDATES,
+            {"index_name": self.index_name, "q": _encode_query_vector(qvec), "k": k},
         ).mappings().all()
-        return [dict(row) for row in rows]
-
-    def _fts_candidates(self, db: Session, query: str, k: int) -> List[Dict]:
-        try:
-            stmt = text(
-                """
-                SELECT rowid AS id, bm25(audio_transcription_chunks_fts) AS bm25
-                FROM audio_transcription_chunks_fts
-                WHERE audio_transcription_chunks_fts MATCH :q
-                ORDER BY bm25 LIMIT :k
-                """
-            )
-            rows = db.execute(stmt, {"q": query, "k": k}).mappings().all()
-        except Exception:
-            like_stmt = text(
-                "SELECT id, 0.5 AS like_score FROM audio_transcription_chunks WHERE chunk_text LIKE :pat LIMIT :k"
-            )
-            rows = db.execute(like_stmt, {"pat": f"%{query}%", "k": k}).mappings().all()
-            rows = [{"id": r["id"], "bm25": 1.0} for r in rows]
-        return [dict(r) for r in rows]
+
+    def _fts_candidates(self, db: Session, query: str, k: int) -> Sequence[Mapping[str, Any]]:
+        # LIKE の全件走査に落とすのは、起動時のFTS再構築中か検索語が取り出せない場合だけ。
+        # MATCH の実行エラーは隠さず呼び出し側へ送出する
+        fts_query = _to_fts_query(query)
+        if FTS_READY.is_set() and fts_query:
+            return db.execute(_FTS_CANDIDATES, {"q": fts_query, "k": k}).mappings().all()
+        rows = db.execute(_LIKE_CANDIDATES, {"pat": f"%{query}%", "k": k}).mappings().all()
+        return [{"id": r["id"], "bm25": 1.0} for r in rows]
+
+    def _fts_candidates_in_new_session(self, db: Session, query: str, k: int) -> Sequence[Mapping[str, Any]]:
+        with Session(bind=db.get_bind()) as fts_db:
+            return self._fts_candidates(fts_db, query, k)
 
     def _blend_and_fetch(
         self,
         db: Session,
-        vec_rows: List[Dict],
-        fts_rows: List[Dict],
+        vec_rows: Sequence[Mapping[str, Any]],
+        fts_rows: Sequence[Mapping[str, Any]],
         top_k: int,
         alpha: float,
     ) -> List[Dict]:
-        vec_map = {int(r["id"]): float(1.0 - float(r["distance"])) for r in vec_rows}
-        fts_map = {int(r["id"]): float(1.0 / (1.0 + max(0.0, float(r["bm25"])))) for r in fts_rows}
-
-        ids = set(vec_map) | set(fts_map)
-        scored: List[Tuple[int, float, float, float]] = []
-        for cid in ids:
-            v = max(0.0, min(1.0, vec_map.get(cid, 0.0)))
-            f = max(0.0, min(1.0, fts_map.get(cid, 0.0)))
-            s = alpha * v + (1.0 - alpha) * f
-            scored.append((cid, s, v, f))
-
-        scored.sort(key=lambda x: x[1], reverse=True)
-        top_ids = [cid for cid, _, _, _ in scored[:top_k]]
-        if not top_ids:
+        # 候補のスコア計算（クランプ→線形結合→上位抽出）は NumPy でまとめて行う。
+        # 行の値は既に int/float なので、型変換は fromiter の dtype に任せる
+        vec_ids = np.fromiter((r["id"] for r in vec_rows), dtype=np.int64, count=len(vec_rows))
+        vec_scores = 1.0 - np.fromiter((r["distance"] for r in vec_rows), dtype=np.float64, count=len(vec_rows))
+        fts_ids = np.fromiter((r["id"] for r in fts_rows), dtype=np.int64, count=len(fts_rows))
+        bm25 = np.fromiter((r["bm25"] for r in fts_rows), dtype=np.float64, count=len(fts_rows))
+        fts_scores = 1.0 / (1.0 + np.maximum(bm25, 0.0))
+
+        ids = np.union1d(vec_ids, fts_ids)
+        if ids.size == 0 or top_k <= 0:
             return []
+        v = np.zeros(ids.size)
+        f = np.zeros(ids.size)
+        v[np.searchsorted(ids, vec_ids)] = vec_scores
+        f[np.searchsorted(ids, fts_ids)] = fts_scores
+        np.clip(v, 0.0, 1.0, out=v)
+        np.clip(f, 0.0, 1.0, out=f)
+        s = alpha * v + (1.0 - alpha) * f
 
-        ids_sql = ",".join(str(int(i)) for i in top_ids)
-        rows = db.execute(
-            text(
-                f"""
-                SELECT
-                    chunk.id AS chunk_id,
-                    chunk.chunk_text AS chunk_text,
-                    chunk.chunk_index AS chunk_index,
-                    trans.id AS transcription_id,
-                    trans.file_path AS file_path,
-                    trans.tags AS tag,
-                    trans.created_at AS recorded_at,
-                    trans.duration_seconds AS duration
-                FROM audio_transcription_chunks AS chunk
-                JOIN audio_transcriptions AS trans ON trans.id = chunk.transcription_id
-                WHERE chunk.id IN ({ids_sql})
-                """
-            )
-        ).mappings().all()
+        k = min(top_k, ids.size)
+        order = np.argpartition(-s, k - 1)[:k] if k < ids.size else np.arange(ids.size)
+        order = order[np.argsort(-s[order], kind="stable")]
+        # NumPy スカラーは tolist() で配列ごとに Python の int/float へ変換する
+        top_ids = ids[order].tolist()
+        scored: List[Tuple[int, float, float, float]] = list(
+            zip(top_ids, s[order].tolist(), v[order].tolist(), f[order].tolist())
+        )
+
+        rows = db.execute(_CHUNK_META_BY_IDS, {"ids": _ids_param(top_ids)}).mappings().all()
 
-        row_map = {int(r["chunk_id"]): r for r in rows}
+        row_map = {r["chunk_id"]: r for r in rows}
         matches: List[Dict] = []
-        for cid, s, v, f in scored[:top_k]:
-            base = row_map.get(int(cid))
+        for cid, score, score_v, score_f in scored:
+            base = row_map.get(cid)
             if not base:
                 continue
             rec = dict(base)
-            rec["score"] = float(s)
-            rec["score_vector"] = float(v)
-            rec["score_fts"] = float(f)
+            rec["score"] = score
+            rec["score_vector"] = score_v
+            rec["score_fts"] = score_f
             matches.append(rec)
         return matches
@@ -4,10 +4,16 @@ from __future__ import annotations
 
 import logging
 import os
+import random
+import threading
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
 from models import (
@@ -17,8 +23,10 @@ from models import (
     LIBSQL_VECTOR_INDEX_NAME,
     USE_VECTOR,
     VECTOR_BACKEND,
+    bulk_insert_chunks,
 )
 from services.rag import (
+    EmbeddingCache,
     LibsqlRetriever,
     chunk_text,
     filter_matches_by_date,
@@ -31,9 +39,14 @@ logger = logging.getLogger(__name__)
 DEFAULT_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "600"))
 DEFAULT_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "120"))
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))  # 1リクエストの入力数
+EMBEDDING_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))  # 同時に投げるバッチ数
+EMBEDDING_MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", "3"))  # レート制限時の再試行回数
 # 2025-10 時点：gpt-5 系列を既定に（Responses API 対応、品質/コスパ良好）。
 COMPLETION_MODEL = os.getenv("RAG_COMPLETION_MODEL", "gpt-5-mini")
 ENABLE_RAG = os.getenv("ENABLE_RAG", "true").lower() in {"1", "true", "yes", "on"}
+# 起動時に OpenAI への接続（TCP/TLS）を張っておき、初回質問の待ち時間を減らす
+RAG_WARMUP = os.getenv("RAG_WARMUP", "false").lower() in {"1", "true", "yes", "on"}
 
 # Hybrid search parameters
 HYBRID_DEFAULT_ALPHA = float(os.getenv("RAG_HYBRID_ALPHA", "0.6"))  # ベクトル寄り
@@ -46,6 +59,24 @@ CONTEXT_MAX_CHARS = int(os.getenv("RAG_CONTEXT_MAX_CHARS", "20000"))  # おお
 
 # Retrieval breadth（検索候補の母集団サイズ）。インデックスは常に全体を対象に上位を返します。
 RETRIEVAL_K = int(os.getenv("RAG_RETRIEVAL_K", "100"))
+# コサイン距離の上限（未設定なら絞り込まない）。超える候補はSQL側で除外する
+_max_distance_env = os.getenv("RAG_MAX_DISTANCE", "").strip()
+MAX_DISTANCE = float(_max_distance_env) if _max_distance_env else None
+
+# クエリ埋め込みをDB検索と並行して取得するためのスレッド（HTTP呼び出しのみ行う）
+_EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-embed")
+# 一括索引時の埋め込みバッチ並列送信用（_EMBED_EXECUTOR 内から呼ばれても詰まらないよう別プール）
+_EMBED_BATCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(1, EMBEDDING_CONCURRENCY), thread_name_prefix="rag-embed-batch"
+)
+# 同じ質問の再実行（再検索・リトライ）で埋め込みAPIを呼び直さないためのLRU件数
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE_SIZE", "256"))
+# 埋め込みの永続キャッシュ（ローカルSQLite）。空文字で無効、TTLは0で無期限。
+# 起動ディレクトリによらずアプリ・scripts・バッチで同じファイルを共有するよう、既定はプロジェクト直下 .cache/
+# （data/ は文字起こし対象の音声置き場なので使わない）
+_DEFAULT_EMBEDDING_CACHE_PATH = Path(__file__).parent.parent.parent / ".cache" / "embedding_cache.db"
+EMBEDDING_CACHE_PATH = os.getenv("RAG_EMBEDDING_CACHE_PATH", str(_DEFAULT_EMBEDDING_CACHE_PATH)).strip()
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("RAG_EMBEDDING_CACHE_TTL_SECONDS", "0"))
 
 
 class RAGService:
@@ -61,6 +92,29 @@ class RAGService:
                 logger.warning("OPENAI_API_KEY が未設定のため RAG を無効化します")
             self._enabled = False
         self._client = OpenAI() if self._enabled else None
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self._embedding_cache = self._open_embedding_cache() if self._client is not None else None
+        if self._client is not None and RAG_WARMUP:
+            threading.Thread(target=self._warmup, name="rag-warmup", daemon=True).start()
+
+    @staticmethod
+    def _open_embedding_cache() -> Optional[EmbeddingCache]:
+        if not EMBEDDING_CACHE_PATH:
+            return None
+        try:
+            Path(EMBEDDING_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+            return EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL, EMBEDDING_CACHE_TTL_SECONDS)
+        except Exception as exc:
+            logger.warning("RAG: 埋め込みキャッシュを開けないため無効化します: %s", exc)
+            return None
+
+    def _warmup(self) -> None:
+        """軽量なリクエストで keep-alive 接続をプールに載せておく（失敗は無視）。"""
+        try:
+            self._client.models.retrieve(EMBEDDING_MODEL)
+        except Exception as exc:  # pragma: no cover - ネットワークエラー
+            logger.debug("RAG: ウォームアップに失敗: %s", exc)
 
     @property
     def enabled(self) -> bool:
@@ -69,50 +123,82 @@ class RAGService:
     def index_transcription(self, db: Session, transcription_id: int, text: str) -> None:
         """文字起こし全文をチャンク化して埋め込みを保存。"""
 
+        self.index_transcriptions(db, [(transcription_id, text)])
+
+    def index_transcriptions(self, db: Session, items: Sequence[Tuple[int, str]]) -> List[int]:
+        """複数の文字起こしをまとめて索引する（埋め込みAPI呼び出しとINSERTを一括化）。
+
+        埋め込みが揃わなかった文字起こしだけをスキップし、その id のリストを返す。
+        """
+
         if not self.enabled:
-            return
-
-        chunks = list(chunk_text(text, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP))
-        if not chunks:
-            logger.debug("RAG: チャンクなしのためスキップ (transcription_id=%s)", transcription_id)
-            return
-
-        embeddings = self._embed_texts(chunks)
-        if not embeddings:
-            logger.warning("RAG: 埋め込み生成に失敗したためスキップ (transcription_id=%s)", transcription_id)
-            return
-
-        # 既存チャンクを削除してから再作成
-        db.query(AudioTranscriptionChunk).filter_by(transcription_id=transcription_id).delete()
-
-        for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-            chunk = AudioTranscriptionChunk(
-                transcription_id=transcription_id,
-                chunk_index=idx,
-                chunk_text=chunk_text,
-                embedding=embedding,
-            )
-            db.add(chunk)
+            return []
+
+        targets: List[Tuple[int, List[str]]] = []
+        for transcription_id, text in items:
+            chunks = list(chunk_text(text, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP))
+            if not chunks:
+                logger.debug("RAG: チャンクなしのためスキップ (transcription_id=%s)", transcription_id)
+                continue
+            targets.append((transcription_id, chunks))
+        if not targets:
+            return []
+
+        all_chunks = [chunk for _, chunks in targets for chunk in chunks]
+        embeddings = self._embed_texts(all_chunks)
+        if len(embeddings) != len(all_chunks):
+            embeddings = [None] * len(all_chunks)
+
+        # 文字起こしごとに埋め込みが全チャンク分揃っているものだけを再作成する
+        rows: List[Dict] = []
+        indexed_ids: List[int] = []
+        failed_ids: List[int] = []
+        offset = 0
+        for transcription_id, chunks in targets:
+            vectors = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            if any(vector is None for vector in vectors):
+                failed_ids.append(transcription_id)
+                continue
+            indexed_ids.append(transcription_id)
+            for idx, (chunk, vector) in enumerate(zip(chunks, vectors)):
+                rows.append(
+                    {
+                        "transcription_id": transcription_id,
+                        "chunk_index": idx,
+                        "chunk_text": chunk,
+                        "embedding": vector,
+                    }
+                )
+        if failed_ids:
+            logger.warning("RAG: 埋め込み生成に失敗したためスキップ (transcription_ids=%s)", failed_ids)
+        if not indexed_ids:
+            return failed_ids
+
+        # 既存チャンクを削除してから一括で再作成
+        db.execute(
+            delete(AudioTranscriptionChunk).where(AudioTranscriptionChunk.transcription_id.in_(indexed_ids))
+        )
+        bulk_insert_chunks(db, rows)
+        return failed_ids
 
     def similarity_search(self, db: Session, query: str, top_k: int = 5) -> List[Dict]:
         if not self.enabled:
             return []
 
-        query_embedding = self._embed_texts([query])
-        if not query_embedding:
+        query_vector = self._embed_query(query)
+        if not query_vector:
             return []
 
-        query_vector = query_embedding[0]
-
         if self._vector_backend != "libsql":
             return []
 
-        rows = self._retriever.similarity_search(db, query_vector, top_k)
+        rows = self._retriever.similarity_search(db, query_vector, top_k, max_distance=MAX_DISTANCE)
 
         matches: List[Dict] = []
         for row in rows:
             distance = row["distance"] or 0.0
-            score = max(0.0, 1.0 - float(distance))
+            score = max(0.0, 1.0 - distance)
             matches.append(
                 {
                     "chunk_id": row["chunk_id"],
@@ -123,7 +209,7 @@ class RAGService:
                     "tag": row.get("tag"),
                     "recorded_at": row.get("recorded_at"),
                     "duration": row.get("duration"),
-                    "distance": float(distance),
+                    "distance": distance,
                     "score": score,
                 }
             )
@@ -145,43 +231,113 @@ class RAGService:
             return []
         if not ENABLE_FTS:
             return self.similarity_search(db, query, top_k)
-
-        # 埋め込み生成
-        qvecs = self._embed_texts([query])
-        if not qvecs:
-            # ベクトルが使えない場合はFTSのみ
-            return self._retriever.fts_only(db, query, top_k)
-        qvec = qvecs[0]
-
-        # 候補母集団の件数
-        cand_k = max(top_k * HYBRID_CAND_MULT, top_k)
-
         if self._vector_backend != "libsql":
             return []
 
-        return self._retriever.hybrid_search(db, query, qvec, top_k, cand_k, alpha)
+        # 候補母集団の件数
+        cand_k = max(top_k * HYBRID_CAND_MULT, top_k)
 
-    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        # 埋め込みAPI呼び出し（ネットワーク待ち）の間にFTS候補をDBから取得しておく
+        embed_future = _EMBED_EXECUTOR.submit(self._embed_query, query)
+        fts_rows = self._retriever.fts_candidates(db, query, cand_k)
+        qvec = embed_future.result()
+        if not qvec:
+            # ベクトルが使えない場合はFTSのみ
+            return self._retriever.fts_only(db, query, top_k, fts_rows=fts_rows)
+
+        return self._retriever.hybrid_search(db, query, qvec, top_k, cand_k, alpha, fts_rows=fts_rows)
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """検索クエリの埋め込み。直近の同一クエリはキャッシュから返す。"""
+        with self._query_cache_lock:
+            cached = self._query_cache.get(query)
+            if cached is not None:
+                self._query_cache.move_to_end(query)
+                return cached
+
+        embeddings = self._embed_texts([query])
+        if not embeddings or embeddings[0] is None:
+            return None
+        vector = embeddings[0]
+        if QUERY_EMBEDDING_CACHE_SIZE > 0:
+            with self._query_cache_lock:
+                self._query_cache[query] = vector
+                self._query_cache.move_to_end(query)
+                while len(self._query_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+        return vector
+
+    def _embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """永続キャッシュにない本文だけ埋め込みAPIに問い合わせ、入力順で返す。
+
+        失敗した入力の位置は None になる（他の入力の位置はずらさない）。
+        """
         if not self._client:
             return []
-        try:
-            response = self._client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
-        except Exception as exc:  # pragma: no cover - APIエラー
-            logger.error("OpenAI embeddings API 呼び出しで失敗: %s", exc)
-            return []
-
-        embeddings: List[List[float]] = []
-        for item in response.data:
-            embedding = getattr(item, "embedding", None)
-            if embedding and len(embedding) == EMBEDDING_DIM:
-                embeddings.append(list(embedding))
-            else:
-                logger.warning(
-                    "RAG: 埋め込みベクトルの次元が想定と異なります (expected=%s, actual=%s)",
-                    EMBEDDING_DIM,
-                    len(embedding) if embedding else None,
-                )
-        return embeddings
+        cache = self._embedding_cache
+        if cache is None or not texts:
+            return self._request_embeddings(texts)
+
+        hits, miss_idx = cache.get_many(texts)
+        if not miss_idx:
+            return [hits[i] for i in range(len(texts))]
+        # 同じ本文が複数回含まれていてもAPIへは1回だけ送る
+        miss_texts = list(dict.fromkeys(texts[i] for i in miss_idx))
+        fetched = self._request_embeddings(miss_texts)
+        ok = [(text, vector) for text, vector in zip(miss_texts, fetched) if vector is not None]
+        if ok:
+            cache.put_many([text for text, _ in ok], [vector for _, vector in ok])
+        by_text = dict(zip(miss_texts, fetched))
+        for i in miss_idx:
+            hits[i] = by_text[texts[i]]
+        return [hits[i] for i in range(len(texts))]
+
+    def _request_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """入力と同じ長さで返す。失敗したバッチ・次元不一致の入力は None。"""
+        # 1リクエストあたりの入力数・トークン数の上限に収まるよう分割して呼び出す
+        batches = [texts[start:start + EMBEDDING_BATCH_SIZE] for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+
+        def _run(batch: List[str]) -> List[Optional[List[float]]]:
+            try:
+                data = self._create_embeddings(batch)
+            except Exception as exc:  # pragma: no cover - APIエラー
+                logger.error("OpenAI embeddings API 呼び出しで失敗: %s", exc)
+                return [None] * len(batch)
+            if len(data) != len(batch):
+                logger.warning("RAG: 埋め込みの件数が入力と一致しません (expected=%s, actual=%s)", len(batch), len(data))
+                return [None] * len(batch)
+            vectors: List[Optional[List[float]]] = []
+            for item in data:
+                embedding = getattr(item, "embedding", None)
+                if embedding and len(embedding) == EMBEDDING_DIM:
+                    vectors.append(list(embedding))
+                else:
+                    logger.warning(
+                        "RAG: 埋め込みベクトルの次元が想定と異なります (expected=%s, actual=%s)",
+                        EMBEDDING_DIM,
+                        len(embedding) if embedding else None,
+                    )
+                    vectors.append(None)
+            return vectors
+
+        if len(batches) <= 1 or EMBEDDING_CONCURRENCY <= 1:
+            results = [_run(batch) for batch in batches]
+        else:
+            # HTTP待ちが支配的なのでスレッドで並行に投げる（map は入力順で結果を返す）
+            results = list(_EMBED_BATCH_EXECUTOR.map(_run, batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def _create_embeddings(self, batch: List[str]) -> list:
+        """1バッチ分の埋め込みAPI呼び出し。レート制限時は指数バックオフで再試行する。"""
+        for attempt in range(EMBEDDING_MAX_RETRIES):
+            try:
+                return self._client.embeddings.create(model=EMBEDDING_MODEL, input=batch).data
+            except RateLimitError:
+                delay = 2 ** attempt + random.random()
+                logger.info("RAG: 埋め込みAPIがレート制限のため %.1f 秒後に再試行します", delay)
+                time.sleep(delay)
+        # 最後の試行はレート制限でも例外をそのまま呼び出し側へ伝える
+        return self._client.embeddings.create(model=EMBEDDING_MODEL, input=batch).data
 
     def _generate_answer(self, prompt: str) -> str:
         if not self._client:
@@ -310,16 +466,16 @@ class RAGService:
         # プロンプト用に上限を適用
         use_k = int(context_k or CONTEXT_MAX_CHUNKS)
         selected: List[Dict] = []
+        append = selected.append
         used_chars = 0
-        for m in matches_all:
-            if len(selected) >= use_k:
-                break
-            txt = m.get("chunk_text") or ""
-            add_len = len(txt) + 128
-            if used_chars + add_len > CONTEXT_MAX_CHARS:
-                break
-            selected.append(m)
+        # 件数上限はスライスで先に適用し、文字数だけをループ内で積算する
+        for m in matches_all[:use_k]:
+            add_len = len(m.get("chunk_text") or "") + 128
             used_chars += add_len
+            if used_chars > CONTEXT_MAX_CHARS:
+                used_chars -= add_len
+                break
+            append(m)
 
         if not selected:
             head = matches_all[0]
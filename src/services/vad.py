@@ -8,8 +8,6 @@ from pathlib import Path
 from typing import List, Optional, Tuple
 
 import numpy as np
-import soundfile as sf
-import librosa
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +31,8 @@ def _energy_trim(audio: np.ndarray, sr: int, top_db: int = 30, pad_ms: int = 150
     """librosaのエネルギーベースで非音声（無音）をカットする簡易版。
     webrtcvadが使えない環境のフォールバックとして使用。
     """
+    import librosa
+
     intervals = librosa.effects.split(audio, top_db=top_db)
     if intervals.size == 0:
         return audio, float(len(audio) / sr)
@@ -63,6 +63,10 @@ def trim_non_speech(
 
     Returns: VADResult
     """
+    # librosa/soundfile は import が重いため、初回の呼び出し時に読み込む
+    import librosa
+    import soundfile as sf
+
     input_path = str(input_path)
     orig_audio, orig_sr = librosa.load(input_path, sr=None, mono=True)
     orig_sec = float(len(orig_audio) / orig_sr if orig_sr else 0.0)
@@ -3,10 +3,11 @@ import sys
 from pathlib import Path
 import importlib.util
 from typing import Dict, Any, Optional
-from dotenv import load_dotenv
+
+from bootstrap import load_env
 
 # .envファイルを読み込む
-load_dotenv()
+load_env()
 
 # スクリプトディレクトリをPythonパスに追加
 sys.path.append(str(Path(__file__).parent.parent / "scripts"))
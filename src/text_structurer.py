@@ -1,12 +1,23 @@
 import os
 import json
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from google import genai
 from google.genai import types
-from dotenv import load_dotenv
+
+from bootstrap import load_env
 
 # .envファイルを読み込む
-load_dotenv()
+load_env()
+
+# これより短い文字起こしは構造化しても情報が得られないためGemini呼び出しを省略する
+MIN_STRUCTURE_CHARS = 20
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key: str) -> genai.Client:
+    """APIキーごとにGeminiクライアントを使い回す（HTTP接続プールを再利用するため）"""
+    return genai.Client(api_key=api_key)
 
 class TextStructurer:
     """Gemini Flash 2.5-liteを使用してテキストをJSON構造化するクラス"""
@@ -17,7 +28,7 @@ class TextStructurer:
         if not api_key:
             raise ValueError("GEMINI_API_KEY or GOOGLE_AI_API_KEY environment variable is not set")
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = _get_client(api_key)
         self.model = "gemini-2.5-flash-lite"
     
     def structure_text(self, transcribed_text: str) -> Optional[Dict[str, Any]]:
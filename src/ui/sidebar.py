@@ -7,6 +7,29 @@ from env_watcher import display_env_status
 from stt_wrapper import STTModelWrapper
 from auth import logout
 
+LOG_TAIL_LINES = 50
+LOG_TAIL_MAX_BYTES = 64 * 1024
+
+
+@st.cache_data(ttl=60)
+def requirements_for_model(model_name: str) -> dict[str, bool]:
+    """選択モデルの環境変数設定状況（60秒キャッシュ。.env変更時は明示的にクリア）。"""
+    return STTModelWrapper(model_name).check_requirements()
+
+
+def _read_log_tail(log_path: Path, max_lines: int = LOG_TAIL_LINES, max_bytes: int = LOG_TAIL_MAX_BYTES) -> str:
+    """ログ末尾のみを読み込む（ファイルサイズに関係なく最大 max_bytes）。"""
+    with open(log_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        tail = f.read().decode("utf-8", errors="replace")
+    lines = tail.splitlines()
+    if size > max_bytes and lines:
+        # 先頭行は途中から読んでいる可能性があるため捨てる
+        lines = lines[1:]
+    return "\n".join(lines[-max_lines:])
+
 
 def build_sidebar(settings: AppSettings, log_dir: Path, logger):
     st.header("⚙️ 設定")
@@ -29,8 +52,7 @@ def build_sidebar(settings: AppSettings, log_dir: Path, logger):
 
     # モデル要件チェック
     try:
-        wrapper = STTModelWrapper(selected_model)
-        requirements = wrapper.check_requirements()
+        requirements = requirements_for_model(selected_model)
         if requirements:
             st.subheader("環境変数の設定状況")
             for key, is_set in requirements.items():
@@ -99,10 +121,7 @@ def build_sidebar(settings: AppSettings, log_dir: Path, logger):
                 if log_path.exists():
                     st.subheader(f"📄 {log_name}")
                     try:
-                        with open(log_path, "r", encoding="utf-8") as f:
-                            lines = f.readlines()
-                            recent = lines[-50:] if len(lines) > 50 else lines
-                            st.code("".join(recent), language="log")
+                        st.code(_read_log_tail(log_path), language="log")
                     except Exception as e:
                         st.error(f"ログ読み込みエラー: {e}")
                 else:
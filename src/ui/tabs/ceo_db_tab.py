@@ -6,12 +6,16 @@ stt-desktop の CeoDbView を Streamlit 向けに簡素化した形。
 
 from __future__ import annotations
 
-import pandas as pd
+from typing import TYPE_CHECKING
+
 import streamlit as st
 from sqlalchemy import delete
 
 from models import CeoTranscription, get_db
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 def _ensure_state() -> None:
     st.session_state.setdefault(
@@ -25,6 +29,8 @@ def _ensure_state() -> None:
 
 
 def _load_records():
+    import pandas as pd
+
     db = next(get_db())
     try:
         records = (
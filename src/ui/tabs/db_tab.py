@@ -1,32 +1,70 @@
 import os
-import pandas as pd
 import streamlit as st
+from sqlalchemy import case, func
 
 from models import AudioTranscription, get_db
 from services.cloudflare_r2 import (
     load_r2_config_from_env,
     build_object_key_for_filename,
     build_public_url_for_key,
-    generate_presigned_get_url,
+    generate_presigned_get_urls,
     object_exists_in_r2,
 )
 
 
+TRANSCRIPT_PREVIEW_CHARS = 50
+
+
 def _ensure_state():
     if "db_tab_state" not in st.session_state:
         st.session_state.db_tab_state = {
             "loaded": False,
             "table": None,
             "records": [],
+            "tag": "すべて",
         }
     if "r2_exists_cache" not in st.session_state:
         st.session_state.r2_exists_cache = {}
 
 
-def _load_db_records():
+@st.cache_data(ttl=30)
+def _load_tag_options() -> list[str]:
+    """タグの選択肢をDBから取得（30秒キャッシュ）。"""
+    db = next(get_db())
+    try:
+        rows = db.query(AudioTranscription.tags).filter(AudioTranscription.tags.isnot(None)).distinct().all()
+    finally:
+        db.close()
+    return sorted({tag for (tag,) in rows if tag})
+
+
+def _transcript_preview_column():
+    """先頭 TRANSCRIPT_PREVIEW_CHARS 文字＋省略記号をSQL側で組み立てる列。"""
+    head = func.substr(AudioTranscription.transcript, 1, TRANSCRIPT_PREVIEW_CHARS)
+    return case(
+        (func.length(AudioTranscription.transcript) > TRANSCRIPT_PREVIEW_CHARS, head.concat("...")),
+        else_=AudioTranscription.transcript,
+    ).label("preview")
+
+
+def _load_db_records(tag_filter: str = "すべて"):
+    import pandas as pd
+
     db = next(get_db())
     try:
-        records = db.query(AudioTranscription).order_by(AudioTranscription.created_at.desc()).all()
+        # 一覧表示に必要な列だけを取得（全文・構造化データは詳細表示時に取得）
+        query = db.query(
+            AudioTranscription.id,
+            AudioTranscription.file_path,
+            AudioTranscription.created_at,
+            AudioTranscription.duration_seconds,
+            AudioTranscription.tags,
+            _transcript_preview_column(),
+        )
+        if tag_filter != "すべて":
+            # 絞り込みはDB側で行い、不要な行を転送しない
+            query = query.filter(AudioTranscription.tags == tag_filter)
+        records = query.order_by(AudioTranscription.created_at.desc()).all()
     finally:
         db.close()
 
@@ -37,32 +75,44 @@ def _load_db_records():
     signed_exp = int(os.getenv("R2_SIGNED_URL_EXPIRES", "900"))
     r2_cache = st.session_state.r2_exists_cache
 
+    # 先に対象キーを集め、公開URLが無いものは署名をまとめて生成する
+    record_keys: dict = {}
+    download_urls: dict = {}
+    if r2_cfg is not None:
+        unsigned_keys = []
+        for record in records:
+            key = build_object_key_for_filename(record.file_path, r2_cfg)
+            if not key:
+                continue
+            exists = r2_cache.get(key)
+            if exists is None:
+                exists = object_exists_in_r2(key, r2_cfg)
+                r2_cache[key] = exists
+            if not exists:
+                continue
+            record_keys[record.id] = key
+            public_url = build_public_url_for_key(key, r2_cfg)
+            if public_url:
+                download_urls[key] = public_url
+            else:
+                unsigned_keys.append(key)
+        if unsigned_keys:
+            download_urls.update(generate_presigned_get_urls(unsigned_keys, expires_in=signed_exp, cfg=r2_cfg))
+
     table_rows = []
     detail_rows = []
 
     for record in records:
-        text = record.transcript or ""
         tag_value = record.tags or ""
-        download_url = None
-
-        if r2_cfg is not None:
-            key = build_object_key_for_filename(record.file_path, r2_cfg)
-            if key:
-                exists = r2_cache.get(key)
-                if exists is None:
-                    exists = object_exists_in_r2(key, r2_cfg)
-                    r2_cache[key] = exists
-                if exists:
-                    download_url = build_public_url_for_key(key, r2_cfg) or generate_presigned_get_url(
-                        key, expires_in=signed_exp, cfg=r2_cfg
-                    )
+        key = record_keys.get(record.id)
+        download_url = download_urls.get(key) if key else None
 
         table_rows.append({
             "ID": record.id,
             "録音時刻": record.created_at,
             "録音時間(s)": record.duration_seconds,
             "タグ": tag_value,
-            "文字起こし": text[:50] + "..." if len(text) > 50 else text,
+            "文字起こし": record.preview or "",
             "音声ファイルダウンロード": download_url,
         })
 
@@ -72,8 +122,6 @@ def _load_db_records():
             "created_at": record.created_at,
             "duration_seconds": record.duration_seconds,
             "tags": tag_value,
-            "transcript": text,
-            "structured_json": record.structured_json,
             "download_url": download_url,
         })
 
@@ -81,6 +129,19 @@ def _load_db_records():
     return df, detail_rows
 
 
+def _load_record_body(record_id: int):
+    """詳細表示用に全文と構造化データを1件分だけ取得する。"""
+    db = next(get_db())
+    try:
+        return (
+            db.query(AudioTranscription.transcript, AudioTranscription.structured_json)
+            .filter(AudioTranscription.id == record_id)
+            .first()
+        )
+    finally:
+        db.close()
+
+
 def run_db_tab():
     st.header("データベース内容")
     _ensure_state()
@@ -95,33 +156,33 @@ def run_db_tab():
         col_reload, _ = st.columns([1, 1])
         with col_reload:
             if st.button("再読み込み", key="db_tab_reload"):
+                _load_tag_options.clear()
                 load_trigger = True
 
-    if load_trigger:
-        df, records = _load_db_records()
-        state["table"] = df
-        state["records"] = records
-        state["loaded"] = True
-
-    if not state["loaded"]:
+    if not state["loaded"] and not load_trigger:
         st.info("「データを読み込む」をクリックするとデータベースを表示します。")
         return
 
-    df = state["table"]
-    records = state["records"]
-
-    if df is None or df.empty:
-        st.info("データベースにレコードがありません。")
-        return
-
-    tag_options = ["すべて"] + sorted({row["tags"] for row in records if row["tags"]})
+    tag_options = ["すべて"] + _load_tag_options()
     if "tag_filter" not in st.session_state:
         st.session_state["tag_filter"] = "すべて"
 
     selected_tag = st.selectbox("タグでフィルタ", tag_options, index=0 if st.session_state["tag_filter"] not in tag_options else tag_options.index(st.session_state["tag_filter"]))
     st.session_state["tag_filter"] = selected_tag
 
-    filtered_df = df if selected_tag == "すべて" else df[df["タグ"] == selected_tag]
+    if load_trigger or selected_tag != state.get("tag"):
+        df, records = _load_db_records(selected_tag)
+        state["table"] = df
+        state["records"] = records
+        state["tag"] = selected_tag
+        state["loaded"] = True
+
+    filtered_df = state["table"]
+    records = state["records"]
+
+    if filtered_df is None or filtered_df.empty:
+        st.info("データベースにレコードがありません。")
+        return
 
     st.dataframe(
         filtered_df,
@@ -142,6 +203,9 @@ def run_db_tab():
         record = record_map.get(selected_id)
 
         if record:
+            body = _load_record_body(record["id"])
+            transcript = (body.transcript if body else None) or ""
+            structured_json = body.structured_json if body else None
             st.subheader(f"ID: {record['id']} の詳細")
             col1, col2 = st.columns([1, 1])
             with col1:
@@ -150,11 +214,11 @@ def run_db_tab():
                 st.write(f"**録音時間:** {record['duration_seconds']}秒")
                 st.write(f"**タグ:** {record['tags'] or '-'}")
                 st.subheader("文字起こしテキスト")
-                st.text_area("", record["transcript"], height=200)
+                st.text_area("", transcript, height=200)
             with col2:
-                if record["structured_json"]:
+                if structured_json:
                     st.subheader("構造化データ")
-                    st.json(record["structured_json"])
+                    st.json(structured_json)
                 if record["download_url"]:
                     st.subheader("ダウンロード")
                     st.link_button("Cloudflare R2 からダウンロード", record["download_url"])
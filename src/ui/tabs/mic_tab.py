@@ -1,15 +1,17 @@
+import itertools
 import os
+import shutil
 import tempfile
 from datetime import datetime
 import streamlit as st
 
 from models import AudioTranscription, get_db
 from stt_wrapper import STTModelWrapper
-from text_structurer import TextStructurer
+from text_structurer import MIN_STRUCTURE_CHARS, TextStructurer
 
 from pathlib import Path
 from services.audio_utils import (
-    md5_bytes,
+    digest_bytes,
     should_convert_to_wav,
     convert_webm_to_wav,
     get_audio_duration,
@@ -17,6 +19,9 @@ from services.audio_utils import (
 from services.cloudflare_r2 import load_r2_config_from_env, upload_file_to_r2
 from services.rag_service import get_rag_service
 
+# 同一秒内の録音でも保存ファイル名が衝突しないようにするプロセス内連番
+_filename_seq = itertools.count()
+
 
 def run_mic_tab(selected_model: str, use_structuring: bool, logger):
     st.header("マイク録音")
@@ -32,10 +37,10 @@ def run_mic_tab(selected_model: str, use_structuring: bool, logger):
 
     st.success("録音完了！")
 
-    # 重複抑止（MD5）
+    # 重複抑止（BLAKE2b ダイジェスト）
     try:
         raw = audio_bytes.getvalue() if hasattr(audio_bytes, 'getvalue') else audio_bytes
-        current_digest = md5_bytes(raw)
+        current_digest = digest_bytes(raw)
     except Exception:
         current_digest = None
 
@@ -55,9 +60,21 @@ def run_mic_tab(selected_model: str, use_structuring: bool, logger):
     if not st.session_state.mic_processing:
         return
 
+    webm_path = None
+    tmp_path = None
+    final_path: str | None = None
+    stt_input_path = None
     try:
-        # 一時保存（WebM想定）
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp_file:
+        # 一時保存（WebM想定）。ローカル保存する場合は保存先と同じディレクトリに作り、
+        # 後段の移動をコピーではなく rename だけで済ませる
+        tmp_dir = None
+        if save_local:
+            try:
+                Path(save_dir).mkdir(parents=True, exist_ok=True)
+                tmp_dir = save_dir
+            except OSError:
+                tmp_dir = None
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm', prefix='.mic_tmp_', dir=tmp_dir) as tmp_file:
             if hasattr(audio_bytes, 'getvalue'):
                 tmp_file.write(audio_bytes.getvalue())
             else:
@@ -83,16 +100,23 @@ def run_mic_tab(selected_model: str, use_structuring: bool, logger):
             # 変換不要でも長さは計測
             duration = get_audio_duration(tmp_path)
         # ローカルへ永続保存（必要なら）
-        final_path: str | None = None
         timestamp = datetime.now()
         file_extension = ".wav" if tmp_path.endswith('.wav') else ".webm"
-        final_filename = f"mic_{timestamp.strftime('%Y%m%d_%H%M%S')}{file_extension}"
+        final_filename = f"mic_{timestamp.strftime('%Y%m%d_%H%M%S')}_{next(_filename_seq):04d}{file_extension}"
         if save_local:
             try:
                 Path(save_dir).mkdir(parents=True, exist_ok=True)
                 final_path = str(Path(save_dir) / final_filename)
-                # tmpを所定の保存先へ移動（同一FS前提。失敗時はコピーでも良い）
-                os.replace(tmp_path, final_path)
+                # tmpを所定の保存先へ移動。別FSで rename できない場合はカーネル内コピー
+                # （shutil.copyfile は Linux で sendfile を使う）してから元のtmpを削除
+                try:
+                    os.replace(tmp_path, final_path)
+                except OSError:
+                    shutil.copyfile(tmp_path, final_path)
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
                 tmp_path = final_path  # 以降のSTTも保存先ファイルを使用
                 logger.info(f"ローカル保存: {final_path}")
             except Exception as e:
@@ -137,7 +161,7 @@ def run_mic_tab(selected_model: str, use_structuring: bool, logger):
             if transcription:
                 structured_data = None
                 tags = "マイク録音"
-                if use_structuring and text_structurer:
+                if use_structuring and text_structurer and len(transcription.strip()) >= MIN_STRUCTURE_CHARS:
                     with st.spinner("テキスト構造化中..."):
                         structured_data = text_structurer.structure_text(transcription)
                         if structured_data:
@@ -267,22 +291,6 @@ def run_mic_tab(selected_model: str, use_structuring: bool, logger):
                 else:
                     st.error("❌ マイク録音の文字起こしに失敗しました（結果が空）")
 
-        # 一時ファイル削除
-        # 一時ファイル削除（ローカル保存できていない場合のみ）
-        if not save_local:
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
-            logger.debug(f"一時ファイル削除: {tmp_path}")
-        # VAD生成ファイルの削除（保存先とは別に生成された場合）
-        try:
-            if 'stt_input_path' in locals() and stt_input_path != tmp_path and os.path.exists(stt_input_path):
-                os.unlink(stt_input_path)
-                logger.debug(f"VAD一時ファイル削除: {stt_input_path}")
-        except Exception:
-            pass
-
         # 状態リセット
         st.session_state.mic_processing = False
         st.session_state.mic_audio_bytes = None
@@ -292,6 +300,15 @@ def run_mic_tab(selected_model: str, use_structuring: bool, logger):
         st.error(error_msg)
         logger.error(error_msg, exc_info=True)
         st.session_state.mic_processing = False
+    finally:
+        # 一時ファイル削除（ローカル保存先へ移動したファイルは残す）。例外時も必ず実行する
+        for path in (webm_path, tmp_path, stt_input_path):
+            if path and path != final_path and os.path.exists(path):
+                try:
+                    os.unlink(path)
+                    logger.debug(f"一時ファイル削除: {path}")
+                except Exception:
+                    pass
 
     st.divider()
     st.markdown("**💡 使い方のヒント:**")
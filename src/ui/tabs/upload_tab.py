@@ -2,13 +2,11 @@ from datetime import datetime
 from pathlib import Path
 import tempfile
 import os
-import pandas as pd
 import streamlit as st
-import librosa
 
 from models import AudioTranscription, get_db
 from stt_wrapper import STTModelWrapper
-from text_structurer import TextStructurer
+from text_structurer import MIN_STRUCTURE_CHARS, TextStructurer
 from services.rag_service import get_rag_service
 from services.vad import trim_non_speech
 
@@ -27,10 +25,14 @@ def run_upload_tab(selected_model: str, use_structuring: bool, logger):
         return
 
     st.success(f"{len(uploaded_files)}個のファイルがアップロードされました")
-    df_files = pd.DataFrame([
-        {"ファイル名": f.name, "サイズ": f"{f.size / 1024:.1f} KB", "タイプ": f.type}
-        for f in uploaded_files
-    ])
+    # pandas/librosa は import が重いため、使用時にのみ読み込む
+    import pandas as pd
+
+    df_files = pd.DataFrame({
+        "ファイル名": [f.name for f in uploaded_files],
+        "サイズ": [f"{f.size / 1024:.1f} KB" for f in uploaded_files],
+        "タイプ": [f.type for f in uploaded_files],
+    })
     st.dataframe(df_files, use_container_width=True)
 
     if st.button(
@@ -49,119 +51,120 @@ def run_upload_tab(selected_model: str, use_structuring: bool, logger):
             st.stop()
 
         rag_service = get_rag_service()
+        import librosa
 
         for idx, uploaded_file in enumerate(uploaded_files):
             status_text.text(f"処理中: {uploaded_file.name} ({idx + 1}/{len(uploaded_files)})")
             progress_bar.progress((idx + 1) / len(uploaded_files))
+            vad_path = None
             try:
+                timestamp = datetime.now()
                 logger.info(f"処理開始: {uploaded_file.name}")
-                with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix) as tmp_file:
+                # with を抜けると一時ファイルは自動削除される（例外時も残らない）
+                with tempfile.NamedTemporaryFile(delete=True, suffix=Path(uploaded_file.name).suffix) as tmp_file:
                     tmp_file.write(uploaded_file.getvalue())
+                    tmp_file.flush()
                     tmp_path = tmp_file.name
 
-                audio_data, sr = librosa.load(tmp_path, sr=None)
-                duration = len(audio_data) / sr
-                logger.debug(f"音声ファイル情報: 時間={duration:.2f}秒, サンプリングレート={sr}Hz")
-
-                # VAD前処理（任意）
-                app_settings = st.session_state.get("settings")
-                use_vad = bool(getattr(app_settings, "get_use_vad", lambda: True)())
-                vad_aggr = int(getattr(app_settings, "get_vad_aggressiveness", lambda: 2)())
-                stt_input_path = tmp_path
-                vad_note = None
-                if use_vad:
-                    try:
-                        vad_res = trim_non_speech(tmp_path, enabled=True, aggressiveness=vad_aggr)
-                        stt_input_path = vad_res.output_path
-                        reduced = 0.0
-                        if vad_res.orig_sec > 0:
-                            reduced = max(0.0, 1.0 - (vad_res.out_sec / vad_res.orig_sec)) * 100.0
-                        vad_note = f"VAD有効: 元{vad_res.orig_sec:.2f}s → 送信{vad_res.out_sec:.2f}s (−{reduced:.1f}%) [{vad_res.method}]"
-                        st.info(vad_note)
-                        logger.info(vad_note)
-                    except Exception as e:
-                        logger.warning(f"VAD前処理に失敗したためスキップ: {e}")
-                        st.warning("VAD前処理に失敗したため、元音声を使用します。")
-                        stt_input_path = tmp_path
-
-                logger.info(f"文字起こし実行中: {uploaded_file.name} (モデル: {selected_model})")
-                transcription = stt_wrapper.transcribe(stt_input_path)
-
-                error_msg = None
-                if isinstance(transcription, tuple) and transcription[0] is None:
-                    error_msg = transcription[1]
-                    transcription = None
-                    logger.error(f"文字起こしエラー: {error_msg}")
-
-                if transcription:
-                    structured_data = None
-                    tags = "未分類"
-                    if use_structuring and text_structurer:
-                        structured_data = text_structurer.structure_text(transcription)
-                        if structured_data:
-                            tags = text_structurer.extract_tags(structured_data)
-
-                    result = {
-                        "file_name": uploaded_file.name,
-                        "created_at": datetime.now(),
-                        "duration_seconds": duration,
-                        "transcript": transcription,
-                        "structured_json": structured_data,
-                        "tags": tags,
-                    }
-
-                    st.session_state.transcriptions.append(result)
-
-                    db = next(get_db())
-                    try:
-                        audio_record = AudioTranscription(
-                            file_path=uploaded_file.name,
-                            created_at=datetime.now(),
-                            duration_seconds=duration,
-                            transcript=transcription,
-                            structured_json=structured_data,
-                            tags=tags,
-                        )
-                        db.add(audio_record)
-                        db.flush()
-
-                        if rag_service.enabled:
-                            try:
-                                rag_service.index_transcription(db, audio_record.id, transcription)
-                            except Exception as exc:  # pragma: no cover - API例外
-                                logger.error("RAG埋め込みの生成に失敗: %s", exc, exc_info=True)
-
-                        db.commit()
-                    except Exception:
-                        db.rollback()
-                        raise
-                    finally:
-                        db.close()
-                else:
-                    if error_msg:
-                        st.error(f"❌ {uploaded_file.name} の文字起こしに失敗しました")
-                        st.error(f"エラー詳細: {error_msg}")
-                        logger.error(f"文字起こし失敗: {uploaded_file.name}, エラー: {error_msg}")
+                    audio_data, sr = librosa.load(tmp_path, sr=None)
+                    duration = len(audio_data) / sr
+                    logger.debug(f"音声ファイル情報: 時間={duration:.2f}秒, サンプリングレート={sr}Hz")
+
+                    # VAD前処理（任意）
+                    app_settings = st.session_state.get("settings")
+                    use_vad = bool(getattr(app_settings, "get_use_vad", lambda: True)())
+                    vad_aggr = int(getattr(app_settings, "get_vad_aggressiveness", lambda: 2)())
+                    stt_input_path = tmp_path
+                    vad_note = None
+                    if use_vad:
+                        try:
+                            vad_res = trim_non_speech(tmp_path, enabled=True, aggressiveness=vad_aggr)
+                            vad_path = vad_res.output_path
+                            stt_input_path = vad_path
+                            reduced = 0.0
+                            if vad_res.orig_sec > 0:
+                                reduced = max(0.0, 1.0 - (vad_res.out_sec / vad_res.orig_sec)) * 100.0
+                            vad_note = f"VAD有効: 元{vad_res.orig_sec:.2f}s → 送信{vad_res.out_sec:.2f}s (−{reduced:.1f}%) [{vad_res.method}]"
+                            st.info(vad_note)
+                            logger.info(vad_note)
+                        except Exception as e:
+                            logger.warning(f"VAD前処理に失敗したためスキップ: {e}")
+                            st.warning("VAD前処理に失敗したため、元音声を使用します。")
+                            stt_input_path = tmp_path
+
+                    logger.info(f"文字起こし実行中: {uploaded_file.name} (モデル: {selected_model})")
+                    transcription = stt_wrapper.transcribe(stt_input_path)
+
+                    error_msg = None
+                    if isinstance(transcription, tuple) and transcription[0] is None:
+                        error_msg = transcription[1]
+                        transcription = None
+                        logger.error(f"文字起こしエラー: {error_msg}")
+
+                    if transcription:
+                        structured_data = None
+                        tags = "未分類"
+                        if use_structuring and text_structurer and len(transcription.strip()) >= MIN_STRUCTURE_CHARS:
+                            structured_data = text_structurer.structure_text(transcription)
+                            if structured_data:
+                                tags = text_structurer.extract_tags(structured_data)
+
+                        result = {
+                            "file_name": uploaded_file.name,
+                            "created_at": timestamp,
+                            "duration_seconds": duration,
+                            "transcript": transcription,
+                            "structured_json": structured_data,
+                            "tags": tags,
+                        }
+
+                        st.session_state.transcriptions.append(result)
+
+                        db = next(get_db())
+                        try:
+                            audio_record = AudioTranscription(
+                                file_path=uploaded_file.name,
+                                created_at=timestamp,
+                                duration_seconds=duration,
+                                transcript=transcription,
+                                structured_json=structured_data,
+                                tags=tags,
+                            )
+                            db.add(audio_record)
+                            db.flush()
+
+                            if rag_service.enabled:
+                                try:
+                                    rag_service.index_transcription(db, audio_record.id, transcription)
+                                except Exception as exc:  # pragma: no cover - API例外
+                                    logger.error("RAG埋め込みの生成に失敗: %s", exc, exc_info=True)
+
+                            db.commit()
+                        except Exception:
+                            db.rollback()
+                            raise
+                        finally:
+                            db.close()
                     else:
-                        st.error(f"❌ {uploaded_file.name} の文字起こしに失敗しました（結果が空）")
-                        logger.error(f"文字起こし失敗: {uploaded_file.name}, 結果が空")
-                # 一時ファイル削除
-                try:
-                    os.unlink(tmp_path)
-                    logger.debug(f"一時ファイル削除: {tmp_path}")
-                except Exception:
-                    pass
-                # VADで生成した一時ファイルも削除
-                if stt_input_path != tmp_path:
-                    try:
-                        os.unlink(stt_input_path)
-                        logger.debug(f"VAD一時ファイル削除: {stt_input_path}")
-                    except Exception:
-                        pass
+                        if error_msg:
+                            st.error(f"❌ {uploaded_file.name} の文字起こしに失敗しました")
+                            st.error(f"エラー詳細: {error_msg}")
+                            logger.error(f"文字起こし失敗: {uploaded_file.name}, エラー: {error_msg}")
+                        else:
+                            st.error(f"❌ {uploaded_file.name} の文字起こしに失敗しました（結果が空）")
+                            logger.error(f"文字起こし失敗: {uploaded_file.name}, 結果が空")
             except Exception as e:
                 error_msg = f"処理エラー ({uploaded_file.name}): {str(e)}"
                 st.error(error_msg)
                 logger.error(error_msg, exc_info=True)
+            finally:
+                # VADで生成した一時ファイルも削除
+                if vad_path and os.path.exists(vad_path):
+                    try:
+                        os.unlink(vad_path)
+                        logger.debug(f"VAD一時ファイル削除: {vad_path}")
+                    except Exception:
+                        pass
 
         progress_bar.progress(1.0)
         status_text.text("✅ すべての処理が完了しました！")